@@ -13,6 +13,7 @@ DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 DEEPSEEK_BASE_URL = "https://api.deepseek.com"
 PUBMED_EMAIL = os.getenv("PUBMED_EMAIL", "your_email@example.com")
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")  # Optional: raises PubMed rate limit from 3 to 10 req/s
 
 # === Directory Configuration ===
 BASE_DIR = Path(__file__).parent
@@ -30,6 +31,7 @@ for dir_path in [DATA_DIR, VECTOR_DB_DIR, PDF_DIR, PROCESSED_DIR]:
 USE_AI_EXPANSION = True  # Enable/disable AI-powered query expansion
 AI_EXPANSION_TIMEOUT = 10  # Timeout for AI API calls (seconds)
 AI_EXPANSION_CACHE_ENABLED = True  # Enable caching for repeated queries
+AI_EXPANSION_SEMANTIC_THRESHOLD = 0.85  # Cosine similarity at which a paraphrased query reuses a cached expansion
 
 # === Query Expansion Rules (Legacy) ===
 QUERY_EXPANSION_CONFIG = {
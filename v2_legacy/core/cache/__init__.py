@@ -0,0 +1,6 @@
+"""
+Core Cache Package
+On-disk caches for slow external lookups
+"""
+
+__all__ = []
@@ -0,0 +1,70 @@
+"""
+PMID → DOI Cache
+SQLite-backed store consulted before any Entrez request
+"""
+
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional
+
+from config import DATA_DIR
+
+DB_PATH = DATA_DIR / "cache" / "pmid_doi.sqlite"
+
+# DOIs rarely change, but re-check occasionally
+TTL_SECONDS = 30 * 24 * 3600
+
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Open (and create) the cache database once per process"""
+    global _conn
+    if _conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _conn.execute("CREATE TABLE IF NOT EXISTS doi (pmid TEXT PRIMARY KEY, doi TEXT, ts REAL)")
+    return _conn
+
+
+def get(pmid: str) -> Optional[str]:
+    """Return the cached DOI for a PMID, or None if missing/expired"""
+    return get_many([pmid]).get(pmid)
+
+
+def get_many(pmids: Iterable[str]) -> Dict[str, str]:
+    """
+    Look up several PMIDs at once.
+
+    Returns:
+        {pmid: doi} for PMIDs with a fresh cache entry
+    """
+    pmids = list(pmids)
+    if not pmids:
+        return {}
+
+    placeholders = ",".join("?" * len(pmids))
+    rows = _get_conn().execute(
+        f"SELECT pmid, doi FROM doi WHERE ts >= ? AND pmid IN ({placeholders})",
+        [time.time() - TTL_SECONDS, *pmids]
+    )
+    return dict(rows.fetchall())
+
+
+def put(pmid: str, doi: str):
+    """Store a resolved DOI"""
+    put_many({pmid: doi})
+
+
+def put_many(mapping: Dict[str, str]):
+    """Store several resolved DOIs in one transaction"""
+    if not mapping:
+        return
+
+    now = time.time()
+    conn = _get_conn()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO doi (pmid, doi, ts) VALUES (?, ?, ?)",
+            [(pmid, doi, now) for pmid, doi in mapping.items()]
+        )
@@ -0,0 +1,80 @@
+"""
+Query Expansion Cache
+SQLite-backed store for AI query expansions, shared across processes and restarts
+"""
+
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config import DATA_DIR
+
+DB_PATH = DATA_DIR / "cache" / "query_expansion.sqlite"
+
+# Expansions depend on prompt/model; refresh them now and then
+TTL_SECONDS = 30 * 24 * 3600
+
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Open (and create) the cache database once per process"""
+    global _conn
+    if _conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        # WAL lets the Streamlit app and CLI scripts read while another process writes
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS expansion "
+            "(query TEXT PRIMARY KEY, expanded TEXT, embedding BLOB, ts REAL)"
+        )
+    return _conn
+
+
+def get(query: str) -> Optional[str]:
+    """Return the cached expansion for a query, or None if missing/expired"""
+    row = _get_conn().execute(
+        "SELECT expanded FROM expansion WHERE query = ? AND ts >= ?",
+        (query, time.time() - TTL_SECONDS)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def put(query: str, expanded: str, embedding: Optional[np.ndarray] = None):
+    """Store an expansion, with its query embedding if one was computed"""
+    blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO expansion (query, expanded, embedding, ts) VALUES (?, ?, ?, ?)",
+            (query, expanded, blob, time.time())
+        )
+
+
+def load_embeddings() -> List[Tuple[str, str, np.ndarray]]:
+    """
+    Fresh entries that have an embedding, for rebuilding the in-memory semantic cache.
+
+    Returns:
+        [(query, expanded, float32 vector), ...]
+    """
+    rows = _get_conn().execute(
+        "SELECT query, expanded, embedding FROM expansion WHERE embedding IS NOT NULL AND ts >= ?",
+        (time.time() - TTL_SECONDS,)
+    ).fetchall()
+    return [(query, expanded, np.frombuffer(blob, dtype=np.float32)) for query, expanded, blob in rows]
+
+
+def clear():
+    """Delete all cached expansions"""
+    conn = _get_conn()
+    with conn:
+        conn.execute("DELETE FROM expansion")
+
+
+def count() -> int:
+    """Number of stored expansions (including expired rows)"""
+    return _get_conn().execute("SELECT COUNT(*) FROM expansion").fetchone()[0]
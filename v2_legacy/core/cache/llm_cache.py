@@ -0,0 +1,63 @@
+"""
+LLM Response Cache
+SQLite-backed store for deterministic re-runs (evaluation, tuning sweeps)
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Optional
+
+from config import DATA_DIR
+
+DB_PATH = DATA_DIR / "cache" / "llm_responses.sqlite"
+
+# Long enough to cover a tuning session, short enough to pick up model updates
+TTL_SECONDS = 7 * 24 * 3600
+
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Open (and create) the cache database once per process"""
+    global _conn
+    if _conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _conn.execute("CREATE TABLE IF NOT EXISTS response (key TEXT PRIMARY KEY, value TEXT, ts REAL)")
+    return _conn
+
+
+def make_key(namespace: str, payload: Any) -> str:
+    """
+    Build a stable cache key.
+
+    Args:
+        namespace: Caller/model identifier so different uses never collide
+        payload: Any JSON-serialisable request description (e.g. messages)
+
+    Returns:
+        SHA-256 hex digest
+    """
+    raw = namespace + json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[Any]:
+    """Return the cached value for a key, or None if missing/expired"""
+    row = _get_conn().execute(
+        "SELECT value FROM response WHERE key = ? AND ts >= ?",
+        (key, time.time() - TTL_SECONDS)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def put(key: str, value: Any):
+    """Store a JSON-serialisable value"""
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO response (key, value, ts) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time())
+        )
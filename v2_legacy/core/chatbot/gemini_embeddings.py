@@ -4,7 +4,9 @@ Use Google Gemini API for text embeddings
 """
 
 import os
-from typing import List
+import asyncio
+import numpy as np
+from typing import Callable, List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,6 +20,8 @@ except ImportError:
 import time
 import logging
 
+from core.llm.llm_client import configure_gemini
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -45,16 +49,21 @@ def retry_with_backoff(retries=3, backoff_in_seconds=1):
 class GeminiEmbeddings:
     """Client for Google Gemini Embeddings API"""
     
+    # Max texts per batchEmbedContents request
+    BATCH_SIZE = 100
+    # Requested explicitly so documents and queries always share one vector size
+    EMBEDDING_DIM = 768
+    
     def __init__(self, api_key: str = None):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not configured in .env file")
         
-        # Configure Gemini
-        genai.configure(api_key=self.api_key)
+        # Configure Gemini (shared with LLMClient so the SDK client is not rebuilt needlessly)
+        configure_gemini(self.api_key)
         self.model = "models/text-embedding-004"
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
         """
         Embed multiple documents
         
@@ -62,24 +71,62 @@ class GeminiEmbeddings:
             texts: List of text strings to embed
             
         Returns:
-            List of embedding vectors
+            (len(texts), EMBEDDING_DIM) float32 array
+        """
+        batches = [
+            self._embed_batch_with_retry(texts[start:start + self.BATCH_SIZE])
+            for start in range(0, len(texts), self.BATCH_SIZE)
+        ]
+        return self._stack(batches)
+    
+    async def embed_documents_async(
+        self,
+        texts: List[str],
+        concurrency: int = 5,
+        on_batch_done: Optional[Callable[[int], None]] = None
+    ) -> np.ndarray:
+        """
+        Embed multiple documents with several batch requests in flight
+        
+        Args:
+            texts: List of text strings to embed
+            concurrency: Max concurrent batch requests
+            on_batch_done: Called with the batch size as each request finishes (e.g. progress bar update)
+            
+        Returns:
+            (len(texts), EMBEDDING_DIM) float32 array (same row order as texts)
         """
-        embeddings = []
+        sem = asyncio.Semaphore(concurrency)
         
-        # Process one by one (Gemini doesn't support batch in old API)
-        for text in texts:
-            self._embed_single_with_retry(text, embeddings)
+        async def run(batch: List[str]) -> np.ndarray:
+            async with sem:
+                # genai client is synchronous; run it in a worker thread
+                vectors = await asyncio.to_thread(self._embed_batch_with_retry, batch)
+            if on_batch_done:
+                on_batch_done(len(batch))
+            return vectors
         
-        return embeddings
+        batches = [texts[i:i + self.BATCH_SIZE] for i in range(0, len(texts), self.BATCH_SIZE)]
+        results = await asyncio.gather(*(run(b) for b in batches))
+        return self._stack(results)
+    
+    def _stack(self, batches: List[np.ndarray]) -> np.ndarray:
+        """Concatenate per-request arrays (empty input gives a (0, dim) array)"""
+        if not batches:
+            return np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+        return np.concatenate(batches)
     
     @retry_with_backoff(retries=5, backoff_in_seconds=2)
-    def _embed_single_with_retry(self, text, embeddings_list):
+    def _embed_batch_with_retry(self, texts: List[str]) -> np.ndarray:
+        """Embed up to BATCH_SIZE texts in one request"""
         result = genai.embed_content(
             model=self.model,
-            content=text,
-            task_type="retrieval_document"
+            content=texts,
+            task_type="retrieval_document",
+            output_dimensionality=self.EMBEDDING_DIM
         )
-        embeddings_list.append(result['embedding'])
+        # Chroma accepts ndarrays directly; skip building per-float Python lists downstream
+        return np.asarray(result['embedding'], dtype=np.float32)
 
     @retry_with_backoff(retries=5, backoff_in_seconds=2)
     def embed_query(self, text: str) -> List[float]:
@@ -95,7 +142,8 @@ class GeminiEmbeddings:
         result = genai.embed_content(
             model=self.model,
             content=text,
-            task_type="retrieval_query"
+            task_type="retrieval_query",
+            output_dimensionality=self.EMBEDDING_DIM
         )
         return result['embedding']
 
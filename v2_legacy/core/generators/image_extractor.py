@@ -14,32 +14,31 @@ class ImageExtractor:
         Returns a list of saved image paths.
         Filters out small icons/logos based on size.
         """
-        doc = fitz.open(pdf_path)
         saved_images = []
 
-        for page_index in range(len(doc)):
-            page = doc[page_index]
-            image_list = page.get_images(full=True)
+        with fitz.open(pdf_path) as doc:
+            for page_index, page in enumerate(doc):
+                image_list = page.get_images(full=True)
 
-            for image_index, img in enumerate(image_list):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                ext = base_image["ext"]
-                width = base_image["width"]
-                height = base_image["height"]
+                for image_index, img in enumerate(image_list):
+                    xref = img[0]
+                    base_image = doc.extract_image(xref)
+                    image_bytes = base_image["image"]
+                    ext = base_image["ext"]
+                    width = base_image["width"]
+                    height = base_image["height"]
 
-                # Filter small images
-                if width < min_width or height < min_height:
-                    continue
+                    # Filter small images
+                    if width < min_width or height < min_height:
+                        continue
 
-                image_filename = f"page{page_index+1}_img{image_index+1}.{ext}"
-                image_path = os.path.join(self.output_dir, image_filename)
+                    image_filename = f"page{page_index+1}_img{image_index+1}.{ext}"
+                    image_path = os.path.join(self.output_dir, image_filename)
 
-                with open(image_path, "wb") as f:
-                    f.write(image_bytes)
+                    with open(image_path, "wb") as f:
+                        f.write(image_bytes)
                 
-                saved_images.append(image_path)
+                    saved_images.append(image_path)
         
         return saved_images
 
@@ -6,10 +6,29 @@ Priority: Gemini > DeepSeek > Error
 
 import os
 import requests
+from requests.adapters import HTTPAdapter
 import google.generativeai as genai
 from typing import List, Dict, Optional, Union
 
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+DEEPSEEK_CHAT_URL = f"{DEEPSEEK_BASE_URL}/chat/completions"
+
+# Key genai is currently configured with; genai.configure() drops the SDK's cached
+# clients, so re-running it per call would reopen the connection every time
+_configured_gemini_key: Optional[str] = None
+
+
+def configure_gemini(api_key: str):
+    """Point the process-wide genai SDK at api_key, skipping the call if it already is"""
+    global _configured_gemini_key
+    if api_key != _configured_gemini_key:
+        genai.configure(api_key=api_key)
+        _configured_gemini_key = api_key
+
 class LLMClient:
+    # Shared keep-alive session so repeated DeepSeek calls skip the TCP/TLS handshake
+    _session: Optional[requests.Session] = None
+
     def __init__(self, gemini_key: Optional[str] = None, deepseek_key: Optional[str] = None):
         """
         Initialize LLM Client with API keys.
@@ -23,7 +42,7 @@ class LLMClient:
         
         # Configure Gemini if key is provided
         if self.gemini_key:
-            genai.configure(api_key=self.gemini_key)
+            configure_gemini(self.gemini_key)
 
     def chat_completion(
         self, 
@@ -62,6 +81,28 @@ class LLMClient:
         else:
             raise ValueError("No API keys provided. Please set GEMINI_API_KEY or DEEPSEEK_API_KEY.")
 
+    @classmethod
+    def _get_session(cls) -> requests.Session:
+        """Return the pooled session used for all DeepSeek HTTP calls"""
+        if cls._session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+            cls._session = session
+        return cls._session
+
+    @classmethod
+    def warm_up(cls):
+        """
+        Open the pooled DeepSeek connection ahead of the first request.
+        
+        A HEAD request does the TCP/TLS handshake and leaves the connection in the
+        session pool; failures are ignored since the real call will retry anyway.
+        """
+        try:
+            cls._get_session().head(DEEPSEEK_BASE_URL, timeout=5)
+        except requests.RequestException:
+            pass
+
     def _call_gemini(self, messages: List[Dict[str, str]], temperature: float) -> str:
         """Call Google Gemini API"""
         # Convert OpenAI-style messages to Gemini format
@@ -133,8 +174,8 @@ class LLMClient:
             "max_tokens": max_tokens
         }
         
-        response = requests.post(
-            "https://api.deepseek.com/chat/completions",
+        response = self._get_session().post(
+            DEEPSEEK_CHAT_URL,
             json=data,
             headers=headers,
             timeout=120
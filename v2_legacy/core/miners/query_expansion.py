@@ -5,20 +5,122 @@ AI-powered dynamic query expansion using DeepSeek API
 
 import re
 import json
-import requests
-from typing import Dict, Optional
-from config import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, GEMINI_API_KEY, PROMPTS, QUERY_EXPANSION_CONFIG
-from core.llm.llm_client import LLMClient
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from config import (
+    DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, GEMINI_API_KEY, PROMPTS, QUERY_EXPANSION_CONFIG,
+    AI_EXPANSION_SEMANTIC_THRESHOLD
+)
+import google.generativeai as genai
+from core.llm.llm_client import LLMClient, configure_gemini
+from core.cache import expansion_cache
 
 
 # ...
 
 
-# Simple cache to avoid repeated API calls for same queries
+# In-process cache in front of the on-disk expansion_cache (AI expansions survive restarts)
 _expansion_cache: Dict[str, str] = {}
 
+# Semantic cache: unit-normalized query embeddings (N, D) and the cached query each row belongs to
+_semantic_vectors: Optional[np.ndarray] = None
+_semantic_queries: List[str] = []
+_semantic_loaded = False
+# Set after the first failed embedding call so later queries skip the semantic path
+_semantic_disabled = False
+# Keeps vector rows and query list aligned when expand_query runs in worker threads
+_semantic_lock = threading.Lock()
 
-def expand_query(user_query: str, use_ai: bool = True, gemini_key: Optional[str] = None, deepseek_key: Optional[str] = None) -> str:
+# Same model/size as GeminiEmbeddings, called directly so a slow or failing
+# endpoint costs one short request instead of its retry/backoff loop
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_DIM = 768
+EMBEDDING_TIMEOUT_SECONDS = 5
+
+
+def _embed_for_cache(query: str, gemini_key: Optional[str]) -> Optional[np.ndarray]:
+    """Unit-normalized query embedding, or None if Gemini embeddings are unavailable"""
+    global _semantic_disabled
+    key = gemini_key or GEMINI_API_KEY
+    if _semantic_disabled or not key:
+        return None
+    
+    try:
+        configure_gemini(key)
+        result = genai.embed_content(
+            model=EMBEDDING_MODEL,
+            content=query,
+            task_type="retrieval_query",
+            output_dimensionality=EMBEDDING_DIM,
+            request_options={"timeout": EMBEDDING_TIMEOUT_SECONDS}
+        )
+        vector = np.asarray(result["embedding"], dtype=np.float32)
+    except Exception as e:
+        print(f"[Warning] Semantic cache embedding failed, disabling it: {e}")
+        _semantic_disabled = True
+        return None
+    
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+def _load_semantic_cache(dim: int):
+    """Seed the semantic cache from persisted embeddings (once per process; caller holds the lock)"""
+    global _semantic_vectors, _semantic_loaded
+    _semantic_loaded = True
+    
+    rows = [row for row in expansion_cache.load_embeddings() if row[2].shape[0] == dim]
+    if not rows:
+        return
+    for query, expanded, _ in rows:
+        _expansion_cache.setdefault(query, expanded)
+    _semantic_queries.extend(query for query, _, _ in rows)
+    _semantic_vectors = np.vstack([vector for _, _, vector in rows])
+
+
+def _semantic_lookup(vector: np.ndarray) -> Optional[str]:
+    """Cached expansion of the most similar previous query, if it clears the threshold"""
+    with _semantic_lock:
+        if not _semantic_loaded:
+            _load_semantic_cache(vector.shape[0])
+        if _semantic_vectors is None:
+            return None
+        
+        sims = _semantic_vectors @ vector
+        best = int(np.argmax(sims))
+        if sims[best] >= AI_EXPANSION_SEMANTIC_THRESHOLD:
+            return _expansion_cache.get(_semantic_queries[best])
+    return None
+
+
+def _semantic_store(query: str, vector: np.ndarray):
+    """Append one query embedding to the semantic cache"""
+    global _semantic_vectors
+    row = vector[np.newaxis, :]
+    with _semantic_lock:
+        _semantic_vectors = row if _semantic_vectors is None else np.vstack([_semantic_vectors, row])
+        _semantic_queries.append(query)
+
+
+def _cached_expansion(query: str) -> Optional[str]:
+    """Expansion from the in-process cache, else from disk (promoted to memory)"""
+    if query in _expansion_cache:
+        return _expansion_cache[query]
+    
+    persisted = expansion_cache.get(query)
+    if persisted:
+        _expansion_cache[query] = persisted
+    return persisted
+
+
+def expand_query(
+    user_query: str,
+    use_ai: bool = True,
+    gemini_key: Optional[str] = None,
+    deepseek_key: Optional[str] = None,
+    use_semantic_cache: bool = False
+) -> str:
     """
     Expand user query using AI-powered intelligent expansion.
     
@@ -27,15 +129,19 @@ def expand_query(user_query: str, use_ai: bool = True, gemini_key: Optional[str]
         use_ai: If True, use LLMClient; if False, use legacy config-based expansion
         gemini_key: Optional dynamic Gemini key
         deepseek_key: Optional dynamic DeepSeek key
+        use_semantic_cache: Opt-in; reuse the AI expansion of a paraphrased earlier query
+            (cosine >= AI_EXPANSION_SEMANTIC_THRESHOLD on Gemini query embeddings)
     """
 
     q = user_query.strip()
     if not q:
         return ""
     
-    # Check cache first
-    if q in _expansion_cache:
-        return _expansion_cache[q]
+    # Check cache first (memory, then disk); legacy-only calls bypass it so they
+    # never return, or overwrite, an AI expansion
+    cached = _cached_expansion(q) if use_ai else None
+    if cached:
+        return cached
     
     # Detect if query contains Chinese characters
     has_chinese = bool(re.search(r"[\u4e00-\u9fff]", q))
@@ -45,12 +151,23 @@ def expand_query(user_query: str, use_ai: bool = True, gemini_key: Optional[str]
     has_keys = (DEEPSEEK_API_KEY or deepseek_key or GEMINI_API_KEY or gemini_key)
     
     if use_ai and has_keys:
+        # One embedding call is far cheaper than an LLM expansion
+        vector = _embed_for_cache(q, gemini_key) if use_semantic_cache else None
+        if vector is not None:
+            cached = _semantic_lookup(vector)
+            # Not stored under q: a near-miss match must not become an exact-key entry
+            if cached:
+                return cached
+        
         try:
             expanded = _expand_with_ai(q, has_chinese=has_chinese, gemini_key=gemini_key, deepseek_key=deepseek_key)
             if expanded and expanded != q:
                 # Cache successful expansion
 
                 _expansion_cache[q] = expanded
+                expansion_cache.put(q, expanded, vector)
+                if vector is not None:
+                    _semantic_store(q, vector)
                 return expanded
         except Exception as e:
             print(f"[Warning] AI expansion failed: {e}, falling back to legacy method")
@@ -61,10 +178,70 @@ def expand_query(user_query: str, use_ai: bool = True, gemini_key: Optional[str]
     else:
         expanded = _expand_generic_query(q)
     
-    _expansion_cache[q] = expanded
+    if use_ai:
+        _expansion_cache[q] = expanded
     return expanded
 
 
+def expand_queries(
+    queries: Sequence[str],
+    gemini_key: Optional[str] = None,
+    deepseek_key: Optional[str] = None
+) -> List[str]:
+    """
+    Expand several queries with one LLM request.
+    
+    Uncached queries are sent together and the model returns a JSON array of
+    expansions; anything the batch reply does not cover goes through expand_query.
+    
+    Args:
+        queries: Raw search queries (any language)
+        gemini_key: Optional dynamic Gemini key
+        deepseek_key: Optional dynamic DeepSeek key
+        
+    Returns:
+        Expanded queries, same order as the input
+    """
+    stripped = [q.strip() for q in queries]
+    pending = [q for q in dict.fromkeys(stripped) if q and not _cached_expansion(q)]
+    
+    has_keys = (DEEPSEEK_API_KEY or deepseek_key or GEMINI_API_KEY or gemini_key)
+    template = PROMPTS.get("query_expansion", {}).get("batch_to_pubmed", "")
+    
+    if len(pending) > 1 and has_keys and template:
+        try:
+            client = LLMClient(gemini_key=gemini_key or GEMINI_API_KEY, deepseek_key=deepseek_key or DEEPSEEK_API_KEY)
+            reply = client.chat_completion(
+                messages=[{"role": "user", "content": template.format(queries=json.dumps(pending, ensure_ascii=False))}],
+                temperature=0.3,
+                max_tokens=300 * len(pending)
+            )
+            
+            # Tolerate a ```json fenced reply
+            reply = reply.strip()
+            if reply.startswith("```"):
+                reply = reply.strip("`").removeprefix("json").strip()
+            expansions = json.loads(reply)
+            
+            if isinstance(expansions, list) and len(expansions) == len(pending):
+                for q, expanded in zip(pending, expansions):
+                    expanded = str(expanded).strip()
+                    # Don't replace an expansion another caller stored while the batch was in flight
+                    if 0 < len(expanded) < 1000 and expanded != q and q not in _expansion_cache:
+                        _expansion_cache[q] = expanded
+                        expansion_cache.put(q, expanded)
+            else:
+                print(f"[Warning] Batch expansion returned {len(expansions) if isinstance(expansions, list) else 'non-list'} items for {len(pending)} queries")
+        except Exception as e:
+            print(f"[Warning] Batch expansion failed: {e}, expanding queries one by one")
+    
+    # Cached (including just-batched) queries return immediately; the rest take the single-query path
+    return [
+        expand_query(q, gemini_key=gemini_key, deepseek_key=deepseek_key) if q else ""
+        for q in stripped
+    ]
+
+
 def _expand_with_ai(query: str, has_chinese: bool = False, gemini_key: Optional[str] = None, deepseek_key: Optional[str] = None) -> str:
     """
     Use Unified LLM Client (Gemini > DeepSeek) to intelligently expand query.
@@ -171,14 +348,21 @@ def _expand_generic_query(query: str) -> str:
 
 
 def clear_cache():
-    """Clear the expansion cache (useful for testing)"""
-    global _expansion_cache
+    """Clear the expansion cache, in memory and on disk (useful for testing)"""
+    global _expansion_cache, _semantic_vectors, _semantic_loaded
     _expansion_cache.clear()
+    expansion_cache.clear()
+    with _semantic_lock:
+        _semantic_vectors = None
+        _semantic_queries.clear()
+        _semantic_loaded = True
 
 
 def get_cache_stats() -> Dict[str, int]:
     """Get cache statistics"""
     return {
         "cached_queries": len(_expansion_cache),
+        "semantic_entries": len(_semantic_queries),
+        "persisted_queries": expansion_cache.count(),
         "cache_size_bytes": len(str(_expansion_cache))
     }
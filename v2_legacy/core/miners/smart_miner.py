@@ -3,11 +3,17 @@ Smart Literature Miner
 Intelligent PubMed mining with rubric-based scoring
 """
 
+import io
 import re
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Dict, List, Tuple, Optional, Callable
 
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
 from Bio import Entrez
 import chromadb
 import chromadb
@@ -15,12 +21,30 @@ import chromadb
 # from core.chatbot.gemini_embeddings import GeminiEmbeddings
 
 
+from core.rag import Evidence
 from config import (
     RUBRIC_CONFIG,
     EMBEDDING_MODEL,
-    PUBMED_EMAIL
+    PUBMED_EMAIL,
+    NCBI_API_KEY
 )
-# from core.impact_factors import get_impact_factor, calculate_if_score
+
+# Impact factor table is a private file (see .gitignore); without it no IF bonus is applied
+try:
+    from core.impact_factors import get_impact_factor, calculate_if_score
+except ImportError:
+    def get_impact_factor(journal: str) -> float:
+        return 0
+
+    def calculate_if_score(impact_factor: float) -> int:
+        return 0
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    import json
+    json_loads = json.loads
 
 try:
     from metapub import PubMedFetcher
@@ -28,6 +52,41 @@ try:
 except ImportError:
     METAPUB_AVAILABLE = False
 
+EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+
+@dataclass(slots=True)
+class ParsedArticle:
+    """Flat view of one Entrez PubmedArticle record (read in a single pass)"""
+    pmid: str
+    title: str
+    abstract: str
+    journal: str
+    journal_lc: str  # lowercased once, shared by scoring/preprint/top-journal checks
+    year: int
+    is_review: bool
+    is_retracted: bool
+    pub_types: List[str]
+    doi: str
+
+
+@dataclass
+class ProcessedPapers:
+    """
+    Scored papers in struct-of-arrays layout.
+    Numeric fields used for selection live in parallel numpy arrays;
+    everything else stays in `meta` (one dict per paper, same order).
+    """
+    ids: np.ndarray             # object[N]
+    scores: np.ndarray          # int32[N]
+    years: np.ndarray           # int16[N]
+    is_review: np.ndarray       # bool_[N]
+    in_top_journal: np.ndarray  # bool_[N]
+    meta: List[Dict[str, Any]]
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
 
 class SmartMiner:
     """
@@ -35,6 +94,11 @@ class SmartMiner:
     Scores papers based on: journal quality, recency, data richness, citations
     """
 
+    # Shared across instances and mine() calls so the NCBI connection stays alive
+    _session: Optional[requests.Session] = None
+
+    _preprint_re = re.compile(r"biorxiv|medrxiv|arxiv|ssrn|preprint")
+
     def __init__(self, email: str = None, log_callback: Optional[Callable] = None):
         """
         Args:
@@ -45,6 +109,10 @@ class SmartMiner:
         Entrez.email = self.email
         self.log_callback = log_callback
         self.rubric = RUBRIC_CONFIG
+        # Lowercase journal names once instead of per paper
+        self._top_journals_lc = [
+            (name.lower(), points) for name, points in self.rubric["top_journals"].items()
+        ]
 
     def _log(self, message: str):
         """Log message via callback if provided"""
@@ -53,6 +121,33 @@ class SmartMiner:
         else:
             print(message)
 
+    @classmethod
+    def _get_session(cls) -> requests.Session:
+        """Return the pooled keep-alive session used for all E-utilities calls"""
+        if cls._session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+            cls._session = session
+        return cls._session
+
+    def _eutils(self, tool: str, **params) -> requests.Response:
+        """
+        Call an E-utilities endpoint (esearch/efetch/elink) over the shared session.
+        POST is used so long query terms and ID lists never hit URL length limits.
+        """
+        params.update(
+            tool="lit-miner",
+            email=self.email,
+            api_key=NCBI_API_KEY
+        )
+        response = self._get_session().post(
+            f"{EUTILS_BASE_URL}/{tool}.fcgi",
+            data={k: v for k, v in params.items() if v is not None},
+            timeout=60
+        )
+        response.raise_for_status()
+        return response
+
     def mine(self, search_term: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Execute full mining pipeline.
@@ -69,15 +164,15 @@ class SmartMiner:
 
         # 1. Search PubMed for IDs
         try:
-            handle = Entrez.esearch(
+            response = self._eutils(
+                "esearch",
                 db="pubmed",
                 term=search_term,
                 retmax=limit,
-                sort="relevance"
+                sort="relevance",
+                retmode="json"
             )
-            record = Entrez.read(handle)
-            handle.close()
-            id_list = record["IdList"]
+            id_list = json_loads(response.content)["esearchresult"]["idlist"]
 
             if not id_list:
                 self._log("⚠️ No papers found")
@@ -88,24 +183,24 @@ class SmartMiner:
             self._log(f"❌ Search failed: {e}")
             return []
 
-        # 2. Fetch details
-        self._log("📦 Fetching paper details...")
-        try:
-            handle = Entrez.efetch(
-                db="pubmed",
-                id=",".join(id_list),
-                retmode="xml"
-            )
-            raw_data = Entrez.read(handle)
-            handle.close()
-            articles = raw_data.get("PubmedArticle", []) + raw_data.get("PubmedBookArticle", [])
-        except Exception as e:
-            self._log(f"❌ Fetch failed: {e}")
-            return []
-
-        # 3. Get citation counts
-        self._log("📊 Fetching citation data...")
-        citation_counts = self._get_citations(id_list)
+        # 2+3. Fetch details and citation counts concurrently; both only need id_list,
+        # and two in-flight requests stay within NCBI's rate limit
+        self._log("📦 Fetching paper details and citation data...")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            citations_future = pool.submit(self._get_citations, id_list)
+            try:
+                response = self._eutils(
+                    "efetch",
+                    db="pubmed",
+                    id=",".join(id_list),
+                    retmode="xml"
+                )
+                raw_data = Entrez.read(io.BytesIO(response.content))
+                articles = raw_data.get("PubmedArticle", []) + raw_data.get("PubmedBookArticle", [])
+            except Exception as e:
+                self._log(f"❌ Fetch failed: {e}")
+                return []
+            citation_counts = citations_future.result()
 
         # 4. Score all papers
         self._log("⚙️ Scoring papers...")
@@ -122,14 +217,14 @@ class SmartMiner:
         """Get citation counts via elink"""
         citation_counts = {}
         try:
-            handle = Entrez.elink(
+            response = self._eutils(
+                "elink",
                 dbfrom="pubmed",
                 db="pubmed",
                 linkname="pubmed_pubmed_citedin",
                 id=",".join(pmid_list)
             )
-            linksets = Entrez.read(handle)
-            handle.close()
+            linksets = Entrez.read(io.BytesIO(response.content))
 
             for ls in linksets:
                 src_list = ls.get("IdList", [])
@@ -146,54 +241,107 @@ class SmartMiner:
 
         return citation_counts
 
-    def _extract_abstract(self, article: Dict[str, Any]) -> str:
-        """Extract abstract text from article structure"""
+    def _parse_article(self, article: Dict[str, Any]) -> ParsedArticle:
+        """
+        Extract all fields needed for scoring from one article.
+
+        Walks the Biopython record once instead of re-resolving
+        MedlineCitation/Article for every field. Cheap checks run first:
+        retracted papers and papers without an abstract are returned as soon
+        as that is known, since the caller drops them anyway.
+        """
+        mc = article["MedlineCitation"]
+        a = mc["Article"]
+
+        # Publication types: review flag + retraction notice
+        pub_types = [str(pt) for pt in a.get("PublicationTypeList", [])]
+        pub_types_lower = [pt.lower() for pt in pub_types]
+
+        # PubMed marks retracted papers in PublicationTypeList and Comments/Corrections
+        is_retracted = any("retract" in pt for pt in pub_types_lower)
+        if not is_retracted:
+            for comment in mc.get("CommentsCorrectionsList", []):
+                if hasattr(comment, "attributes") and \
+                        comment.attributes.get("RefType", "") in ("RetractionIn", "RetractionOf"):
+                    is_retracted = True
+                    break
+
+        parsed = ParsedArticle(
+            pmid=str(mc["PMID"]),
+            title=str(a.get("ArticleTitle", "No Title")),
+            abstract="",
+            journal="Unknown",
+            journal_lc="unknown",
+            year=2020,
+            is_review=any("review" in pt for pt in pub_types_lower),
+            is_retracted=is_retracted,
+            pub_types=pub_types,
+            doi=""
+        )
+        if is_retracted:
+            return parsed
+
+        # Abstract
+        abstract_data = a.get("Abstract", {}).get("AbstractText", [])
+        if isinstance(abstract_data, list):
+            text_parts = []
+            for item in abstract_data:
+                if hasattr(item, "attributes") and "Label" in item.attributes:
+                    text_parts.append(f"{item.attributes['Label']}: {str(item)}")
+                else:
+                    text_parts.append(str(item))
+            parsed.abstract = " ".join(text_parts)
+        elif abstract_data:
+            parsed.abstract = str(abstract_data)
+        if not parsed.abstract:
+            return parsed
+
+        # Journal + year
+        journal_data = a.get("Journal", {})
+        parsed.journal = str(journal_data.get("Title", "Unknown"))
+        parsed.journal_lc = parsed.journal.lower()
+        pub_date = journal_data.get("JournalIssue", {}).get("PubDate", {})
         try:
-            abstract_data = (
-                article["MedlineCitation"]["Article"]
-                .get("Abstract", {})
-                .get("AbstractText", [])
-            )
-            if not abstract_data:
-                return ""
-
-            if isinstance(abstract_data, list):
-                text_parts = []
-                for item in abstract_data:
-                    if hasattr(item, "attributes") and "Label" in item.attributes:
-                        text_parts.append(f"{item.attributes['Label']}: {str(item)}")
-                    else:
-                        text_parts.append(str(item))
-                return " ".join(text_parts)
-            return str(abstract_data)
-        except Exception:
-            return ""
+            if "Year" in pub_date:
+                parsed.year = int(pub_date["Year"])
+            elif "MedlineDate" in pub_date:
+                found = re.search(r"\d{4}", pub_date["MedlineDate"])
+                if found:
+                    parsed.year = int(found.group())
+        except ValueError:
+            pass
+
+        # DOI
+        for aid in article.get("PubmedData", {}).get("ArticleIdList", []):
+            if hasattr(aid, "attributes") and aid.attributes.get("IdType") == "doi":
+                parsed.doi = str(aid)
+                break
 
-    def _score_papers(self, articles: List[Dict], citation_counts: Dict[str, int]) -> List[Dict[str, Any]]:
-        """Score all papers and return processed list"""
+        return parsed
+
+    def _score_papers(self, articles: List[Dict], citation_counts: Dict[str, int]) -> ProcessedPapers:
+        """Score all papers and return them as parallel arrays"""
         processed = []
+        in_top_journal = []
 
         for article in articles:
             try:
-                pmid = str(article["MedlineCitation"]["PMID"])
-                article_core = article["MedlineCitation"]["Article"]
-                title = article_core.get("ArticleTitle", "No Title")
-                abstract = self._extract_abstract(article)
-
-                if not abstract:
-                    continue
+                parsed = self._parse_article(article)
 
                 # ⚠️ Quality Assurance 1: Check for retraction
-                is_retracted = self._check_retraction_status(article)
-                if is_retracted:
-                    self._log(f"⚠️  Skipping retracted paper: {title[:50]}...")
+                if parsed.is_retracted:
+                    self._log(f"⚠️  Skipping retracted paper: {parsed.title[:50]}...")
                     continue  # Skip retracted papers entirely
 
+                if not parsed.abstract:
+                    continue
+
+                journal = parsed.journal
+
                 # Calculate base score
-                score, journal, year, reasons, is_review = self._calculate_score(article)
+                score, reasons = self._calculate_score(parsed)
 
                 # 🔬 Quality Assurance 2: Impact Factor bonus
-                from core.impact_factors import get_impact_factor, calculate_if_score
                 impact_factor = get_impact_factor(journal)
                 if impact_factor > 0:
                     if_score = calculate_if_score(impact_factor)
@@ -202,144 +350,85 @@ class SmartMiner:
                         reasons.append(f"IF={impact_factor}(+{if_score})")
 
                 # 📄 Quality Assurance 3: Preprint marking
-                is_preprint = self._check_preprint(journal)
+                is_preprint = self._check_preprint(parsed.journal_lc)
                 if is_preprint:
                     score = int(score * 0.5)  # 50% penalty for preprints
                     reasons.append("preprint(-50%)")
 
                 # Data quality bonus
-                bone_vals = re.findall(r"(\d+\.?\d*)\s?mm", abstract)
+                bone_vals = re.findall(r"(\d+\.?\d*)\s?mm", parsed.abstract)
                 if bone_vals:
                     score += self.rubric["data_quality_bonus"]
                     reasons.append(f"data(+{self.rubric['data_quality_bonus']})")
 
                 # Citation bonus
-                citations = citation_counts.get(pmid, 0)
+                citations = citation_counts.get(parsed.pmid, 0)
                 if citations > 0:
                     cite_score = self._get_citation_score(citations)
                     if cite_score > 0:
                         score += cite_score
                         reasons.append(f"cited(+{cite_score})")
 
-                # Extract DOI if available
-                doi = ""
-                try:
-                    article_ids = article.get("PubmedData", {}).get("ArticleIdList", [])
-                    for aid in article_ids:
-                        if hasattr(aid, "attributes") and aid.attributes.get("IdType") == "doi":
-                            doi = str(aid)
-                            break
-                except Exception:
-                    pass
-
                 processed.append({
-                    "id": pmid,
-                    "title": title,
-                    "abstract": abstract,
+                    "id": parsed.pmid,
+                    "title": parsed.title,
+                    "abstract": parsed.abstract,
                     "journal": journal,
-                    "year": year,
+                    "year": parsed.year,
                     "score": score,
-                    "is_review": is_review,
+                    "is_review": parsed.is_review,
                     "is_preprint": is_preprint,
                     "impact_factor": impact_factor,
                     "citations": citations,
-                    "doi": doi,
+                    "doi": parsed.doi,
                     "reasons": ", ".join(reasons) if reasons else "base"
                 })
+                in_top_journal.append(self._in_top_journal(parsed.journal_lc))
             except Exception:
                 continue
 
-        return processed
+        return ProcessedPapers(
+            ids=np.array([p["id"] for p in processed], dtype=object),
+            scores=np.array([p["score"] for p in processed], dtype=np.int32),
+            years=np.array([p["year"] for p in processed], dtype=np.int16),
+            is_review=np.array([p["is_review"] for p in processed], dtype=np.bool_),
+            in_top_journal=np.array(in_top_journal, dtype=np.bool_),
+            meta=processed
+        )
 
-    def _calculate_score(self, article: Dict[str, Any]) -> Tuple[int, str, int, List[str], bool]:
+    def _calculate_score(self, parsed: ParsedArticle) -> Tuple[int, List[str]]:
         """Calculate base score for one paper"""
         score = 1
         reasons = []
 
         # Journal
-        journal = "Unknown"
-        try:
-            journal = article["MedlineCitation"]["Article"]["Journal"].get("Title", "Unknown")
-        except Exception:
-            pass
-
-        for name, points in self.rubric["top_journals"].items():
-            if name.lower() in journal.lower():
+        for name, points in self._top_journals_lc:
+            if name in parsed.journal_lc:
                 score += points
                 reasons.append(f"journal(+{points})")
                 break
 
         # Year
-        year = 2020
-        try:
-            pub_date = article["MedlineCitation"]["Article"]["Journal"]["JournalIssue"]["PubDate"]
-            if "Year" in pub_date:
-                year = int(pub_date["Year"])
-            elif "MedlineDate" in pub_date:
-                found = re.search(r"\d{4}", pub_date["MedlineDate"])
-                if found:
-                    year = int(found.group())
-
-            gap = datetime.now().year - year
-            year_score = max(0, self.rubric["recency_max_score"] - gap)
-            if year_score > 0:
-                score += year_score
-                reasons.append(f"recent(+{year_score})")
-        except Exception:
-            pass
+        gap = datetime.now().year - parsed.year
+        year_score = max(0, self.rubric["recency_max_score"] - gap)
+        if year_score > 0:
+            score += year_score
+            reasons.append(f"recent(+{year_score})")
 
         # Review check
-        is_review = False
-        try:
-            pub_types = article["MedlineCitation"]["Article"].get("PublicationTypeList", [])
-            for pt in pub_types:
-                if "review" in str(pt).lower():
-                    is_review = True
-                    reasons.append("review")
-                    break
-        except Exception:
-            pass
-
-        return score, journal, year, reasons, is_review
+        if parsed.is_review:
+            reasons.append("review")
 
-    def _check_retraction_status(self, article: Dict[str, Any]) -> bool:
-        """
-        Check if paper has been retracted
-
-        PubMed marks retracted papers in PublicationTypeList
-        """
-        try:
-            pub_types = article["MedlineCitation"]["Article"].get("PublicationTypeList", [])
-            for pt in pub_types:
-                pt_str = str(pt).lower()
-                if "retract" in pt_str:
-                    return True
-
-            # Also check in Comments/Corrections
-            comments = article.get("MedlineCitation", {}).get("CommentsCorrectionsList", [])
-            for comment in comments:
-                if hasattr(comment, "attributes"):
-                    ref_type = comment.attributes.get("RefType", "")
-                    if ref_type in ["RetractionIn", "RetractionOf"]:
-                        return True
-
-            return False
-        except Exception:
-            return False
+        return score, reasons
 
-    def _check_preprint(self, journal: str) -> bool:
+    def _check_preprint(self, journal_lc: str) -> bool:
         """
         Check if paper is from a preprint server
 
         Preprint servers: bioRxiv, medRxiv, arXiv, etc.
+        Expects the already-lowercased journal name.
         """
-        if not journal:
-            return False
-
-        journal_lower = journal.lower()
-        preprint_servers = ["biorxiv", "medrxiv", "arxiv", "ssrn", "preprint"]
-
-        return any(server in journal_lower for server in preprint_servers)
+        return self._preprint_re.search(journal_lc) is not None
 
     def _get_citation_score(self, count: int) -> int:
         """Calculate citation score"""
@@ -348,51 +437,61 @@ class SmartMiner:
                 return points
         return 0
 
-    def _select_final_papers(self, processed: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _in_top_journal(self, journal_lc: str) -> bool:
+        """Check if the (lowercased) journal matches any configured top journal"""
+        return any(name in journal_lc for name, _ in self._top_journals_lc)
+
+    @staticmethod
+    def _top_k(candidates: np.ndarray, key: np.ndarray, k: int) -> np.ndarray:
+        """
+        Return the k candidate indices with the largest key, best first.
+        Ties keep their original order (same result as a stable descending sort).
+        """
+        if candidates.size == 0:
+            return candidates
+        # Make keys unique by folding in the position so ties resolve to the earlier paper
+        n = key.size
+        rank = key[candidates].astype(np.int64) * n + (n - 1 - candidates)
+        if candidates.size > k:
+            part = np.argpartition(-rank, k - 1)[:k]
+            candidates, rank = candidates[part], rank[part]
+        return candidates[np.argsort(-rank)]
+
+    def _select_final_papers(self, processed: ProcessedPapers) -> List[Dict[str, Any]]:
         """Select final papers based on strategy"""
-        if not processed:
+        if not len(processed):
             return []
         
         current_year = datetime.now().year
         selected = []
-        selected_ids = set()
+        chosen = np.zeros(len(processed), dtype=np.bool_)
+        
+        # processed is local to mine() and each index is taken at most once,
+        # so tag the meta dicts in place instead of copying them
+        def take(indices: np.ndarray, category: str):
+            for i in indices:
+                p = processed.meta[i]
+                p["category"] = category
+                selected.append(p)
+            chosen[indices] = True
         
         # 1. Top 2 reviews
-        reviews = [p for p in processed if p.get("is_review")]
-        reviews.sort(key=lambda x: x["score"], reverse=True)
-        for p in reviews[:2]:
-            p = dict(p)
-            p["category"] = "high_impact"
-            selected.append(p)
-            selected_ids.add(p["id"])
+        review_idx = np.flatnonzero(processed.is_review)
+        take(self._top_k(review_idx, processed.scores, 2), "high_impact")
         
         # 2. Recent papers from top journals (4)
-        def in_top_journal(journal: str) -> bool:
-            j_lower = journal.lower()
-            return any(name.lower() in j_lower for name in self.rubric["top_journals"].keys())
-        
-        recent_top = [
-            p for p in processed
-            if not p.get("is_review")
-            and p["id"] not in selected_ids
-            and p.get("year", 0) >= current_year - 1
-            and in_top_journal(p.get("journal", ""))
-        ]
-        recent_top.sort(key=lambda x: (x.get("year", 0), x["score"]), reverse=True)
-        for p in recent_top[:4]:
-            p = dict(p)
-            p["category"] = "recent"
-            selected.append(p)
-            selected_ids.add(p["id"])
+        recent_mask = (
+            ~processed.is_review
+            & ~chosen
+            & (processed.years >= current_year - 1)
+            & processed.in_top_journal
+        )
+        recency_key = processed.years.astype(np.int64) * 1000 + processed.scores
+        take(self._top_k(np.flatnonzero(recent_mask), recency_key, 4), "recent")
         
         # 3. Top scored studies (4)  
-        remaining = [p for p in processed if not p.get("is_review") and p["id"] not in selected_ids]
-        remaining.sort(key=lambda x: x["score"], reverse=True)
-        for p in remaining[:4]:
-            p = dict(p)
-            p["category"] = "data_rich"
-            selected.append(p)
-            selected_ids.add(p["id"])
+        remaining_idx = np.flatnonzero(~processed.is_review & ~chosen)
+        take(self._top_k(remaining_idx, processed.scores, 4), "data_rich")
         
         return selected
 
@@ -401,6 +500,10 @@ class PersistentMemory:
     """
     Vector database for storing and querying paper abstracts
     """
+
+    # Batches larger than this are split into ADD_CHUNK_SIZE add() calls
+    ADD_BATCH_THRESHOLD = 1000
+    ADD_CHUNK_SIZE = 512
     
     def __init__(self, db_name: str, data_dir: str):
         """
@@ -451,12 +554,7 @@ class PersistentMemory:
             
             # Re-embed and add
             new_embeddings = self.embeddings.embed_documents(docs)
-            self.collection.add(
-                ids=ids,
-                embeddings=new_embeddings,
-                documents=docs,
-                metadatas=metas
-            )
+            self._add_batched(ids, new_embeddings, docs, metas)
             print("✅ Migration complete!")
                 
         except Exception as e:
@@ -466,6 +564,24 @@ class PersistentMemory:
         """Force migration of current collection"""
         self._migrate_if_needed(self.collection.name, force=True)
 
+    def _add_batched(self, ids: List[str], embeddings: np.ndarray,
+                     docs: List[str], metas: List[Dict[str, Any]]):
+        """
+        Add records to the collection, chunking very large batches
+        to bound Chroma's in-memory staging.
+        """
+        if not ids:
+            return
+        step = self.ADD_CHUNK_SIZE if len(ids) > self.ADD_BATCH_THRESHOLD else len(ids)
+        for start in range(0, len(ids), step):
+            end = start + step
+            self.collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=docs[start:end],
+                metadatas=metas[start:end]
+            )
+
 
 
 
@@ -503,25 +619,16 @@ class PersistentMemory:
         # Add to database
         if final_ids:
             # embeddings = self.embedding_fn.encode(final_docs).tolist()
+            # float32 array: Chroma takes numpy directly, no list-of-lists conversion
             embeddings = self.embeddings.embed_documents(final_docs)
             try:
-                self.collection.add(
-                    ids=final_ids,
-                    embeddings=embeddings,
-                    documents=final_docs,
-                    metadatas=final_metas
-                )
+                self._add_batched(final_ids, embeddings, final_docs, final_metas)
             except Exception as e:
                 if "dimension" in str(e).lower():
                     print(f"⚠️ Dimension mismatch detected during add: {e}")
                     self._force_migration()
                     # Retry add
-                    self.collection.add(
-                        ids=final_ids,
-                        embeddings=embeddings,
-                        documents=final_docs,
-                        metadatas=final_metas
-                    )
+                    self._add_batched(final_ids, embeddings, final_docs, final_metas)
                 else:
                     raise e
 
@@ -551,4 +658,8 @@ class PersistentMemory:
                 raise e
         return results
 
+    def query_evidence(self, topic: str, n: int = 20) -> Evidence:
+        """Query for relevant papers and return them as an Evidence column view"""
+        return Evidence.from_chroma(self.query(topic, n))
+
 
@@ -0,0 +1,6 @@
+"""
+Core Network Package
+Shared helpers for polite outbound HTTP (rate limiting)
+"""
+
+__all__ = []
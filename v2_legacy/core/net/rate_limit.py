@@ -0,0 +1,95 @@
+"""
+Rate Limiting
+Async token buckets with per-host adaptive rates (back off on 429/503, recover on success)
+"""
+
+import time
+import asyncio
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Async token bucket.
+
+    Args:
+        rate: Tokens added per second
+        burst: Bucket capacity (max requests allowed back-to-back)
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        """Change the refill rate (tokens earned so far are kept)"""
+        self._refill()
+        self.rate = rate
+
+    async def acquire(self):
+        """Take one token, waiting for a refill if the bucket is empty"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """
+    One adaptive token bucket per host, so a slow or throttling site
+    only slows down requests to itself.
+
+    Args:
+        rate: Starting (and maximum) requests per second per host
+        burst: Requests allowed back-to-back per host
+        min_rate: Floor for the rate after repeated penalties
+    """
+
+    # Status codes that mean "slow down"
+    THROTTLE_STATUSES = (403, 429, 503)
+
+    def __init__(self, rate: float = 2.0, burst: int = 2, min_rate: float = 1 / 60):
+        self.base_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.base_rate, self.burst)
+        return bucket
+
+    async def acquire(self, host: str):
+        """Wait until a request to host is allowed"""
+        await self._bucket(host).acquire()
+
+    def penalize(self, host: str):
+        """Halve the host's rate and drop any saved-up burst"""
+        bucket = self._bucket(host)
+        bucket.set_rate(max(self.min_rate, bucket.rate / 2))
+        bucket.tokens = min(bucket.tokens, 0.0)
+
+    def reward(self, host: str):
+        """Recover the host's rate gradually after a successful request"""
+        bucket = self._bucket(host)
+        if bucket.rate < self.base_rate:
+            bucket.set_rate(min(self.base_rate, bucket.rate * 1.25))
+
+    def record(self, host: str, status: int):
+        """Penalize or reward host based on an HTTP status code"""
+        if status in self.THROTTLE_STATUSES:
+            self.penalize(host)
+        elif 200 <= status < 300:
+            self.reward(host)
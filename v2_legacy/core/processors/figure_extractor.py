@@ -9,8 +9,7 @@ import sys
 import argparse
 import layoutparser as lp
 import cv2
-import numpy as np
-from pdf2image import convert_from_path
+import pypdfium2 as pdfium
 
 def extract_images_from_pdf(pdf_path: str, output_dir: str = "extracted_images"):
     """
@@ -53,49 +52,56 @@ def extract_images_from_pdf(pdf_path: str, output_dir: str = "extracted_images")
                 label_map={0: "Text", 1: "Title", 2: "List", 3: "Table", 4: "Figure"}
             )
         
-        print("\n[*] 将PDF页面转换为图片...")
-        images = convert_from_path(pdf_path, dpi=200)
-        print(f"✅ 共 {len(images)} 页")
+        # 用PDFium直接渲染页面 (无需poppler子进程)
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            num_pages = len(pdf)
+            print(f"\n✅ 共 {num_pages} 页")
         
-        total_figures = 0
+            total_figures = 0
         
-        for i, image in enumerate(images):
-            print(f"\n📖 分析第 {i+1}/{len(images)} 页...")
+            for i in range(num_pages):
+                print(f"\n📖 分析第 {i+1}/{num_pages} 页...")
             
-            # 转换为numpy数组
-            image_np = np.array(image)
+                # 渲染为RGB numpy数组 (200 DPI), 渲染后立即释放页面
+                page = pdf[i]
+                image_np = page.render(scale=200 / 72, rev_byteorder=True).to_numpy()
+                page.close()
             
-            # 检测布局
-            layout = model.detect(image_np)
+                # 检测布局
+                layout = model.detect(image_np)
             
-            # 筛选图片区域
-            figure_blocks = lp.Layout([b for b in layout if b.type == 'Figure'])
+                # 筛选图片区域
+                figure_blocks = lp.Layout([b for b in layout if b.type == 'Figure'])
             
-            if not figure_blocks:
-                print(f"   [ ] 未检测到图片")
-                continue
+                if not figure_blocks:
+                    print(f"   [ ] 未检测到图片")
+                    continue
             
-            print(f"   [+] 发现 {len(figure_blocks)} 张图片")
+                print(f"   [+] 发现 {len(figure_blocks)} 张图片")
             
-            for j, block in enumerate(figure_blocks):
-                # 裁剪图片
-                segment_image = block.crop_image(image_np)
+                for j, block in enumerate(figure_blocks):
+                    # 裁剪图片
+                    segment_image = block.crop_image(image_np)
                 
-                # 过滤太小的图片
-                if segment_image.size == 0 or segment_image.shape[0] < 50 or segment_image.shape[1] < 50:
-                    print(f"       [跳过] 图片 {j+1} 太小")
-                    continue
+                    # 过滤太小的图片
+                    if segment_image.size == 0 or segment_image.shape[0] < 50 or segment_image.shape[1] < 50:
+                        print(f"       [跳过] 图片 {j+1} 太小")
+                        continue
                 
-                # 保存
-                filename = f"page{i+1}_figure{j+1}.png"
-                filepath = os.path.join(target_dir, filename)
+                    # 保存
+                    filename = f"page{i+1}_figure{j+1}.png"
+                    filepath = os.path.join(target_dir, filename)
                 
-                # RGB转BGR (OpenCV格式)
-                segment_image_bgr = cv2.cvtColor(segment_image, cv2.COLOR_RGB2BGR)
-                cv2.imwrite(filepath, segment_image_bgr)
+                    # RGB转BGR (OpenCV格式)
+                    segment_image_bgr = cv2.cvtColor(segment_image, cv2.COLOR_RGB2BGR)
+                    cv2.imwrite(filepath, segment_image_bgr)
                 
-                print(f"       ✅ {filename} (置信度: {block.score:.2f})")
-                total_figures += 1
+                    print(f"       ✅ {filename} (置信度: {block.score:.2f})")
+                    total_figures += 1
+        finally:
+            # 检测/裁剪出错时也释放PDF句柄 (Windows下否则文件保持锁定)
+            pdf.close()
         
         print(f"\n🎉 完成! 共提取 {total_figures} 张图片")
         print(f"📁 保存位置: {target_dir}")
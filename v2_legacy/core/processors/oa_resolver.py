@@ -0,0 +1,146 @@
+"""
+开放获取(OA) PDF解析
+
+通过 Unpaywall / Europe PMC 查找DOI对应的开放获取PDF地址,
+命中时直接HTTP下载,无需启动浏览器
+"""
+
+import os
+import asyncio
+import itertools
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import PUBMED_EMAIL
+
+UNPAYWALL_URL = "https://api.unpaywall.org/v2/{doi}"
+EUROPEPMC_SEARCH_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"
+
+# 流式写盘的块大小
+CHUNK_SIZE = 128 * 1024
+
+_session: Optional[requests.Session] = None
+
+
+def _get_session() -> requests.Session:
+    """共享的keep-alive会话"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+        session.headers["User-Agent"] = f"lit-miner (mailto:{PUBMED_EMAIL})"
+        _session = session
+    return _session
+
+
+def _unpaywall_pdf_url(doi: str) -> Optional[str]:
+    """从Unpaywall获取OA PDF地址"""
+    response = _get_session().get(
+        UNPAYWALL_URL.format(doi=doi), params={"email": PUBMED_EMAIL}, timeout=15
+    )
+    if response.status_code != 200:
+        return None
+    
+    data = response.json()
+    best = data.get("best_oa_location") or {}
+    if best.get("url_for_pdf"):
+        return best["url_for_pdf"]
+    for location in data.get("oa_locations") or []:
+        if location.get("url_for_pdf"):
+            return location["url_for_pdf"]
+    return None
+
+
+def _europepmc_pdf_url(doi: str) -> Optional[str]:
+    """从Europe PMC获取OA PDF地址"""
+    response = _get_session().get(
+        EUROPEPMC_SEARCH_URL,
+        params={"query": f'DOI:"{doi}"', "resultType": "core", "format": "json"},
+        timeout=15
+    )
+    if response.status_code != 200:
+        return None
+    
+    for result in response.json().get("resultList", {}).get("result", []):
+        for full_text in result.get("fullTextUrlList", {}).get("fullTextUrl", []):
+            if full_text.get("documentStyle") == "pdf" and full_text.get("availabilityCode") in ("OA", "F"):
+                return full_text.get("url")
+    return None
+
+
+def find_oa_pdf_url(doi: str) -> Optional[str]:
+    """
+    查找DOI的开放获取PDF地址
+    
+    Args:
+        doi: DOI
+        
+    Returns:
+        PDF地址,未找到返回None
+    """
+    for resolver in (_unpaywall_pdf_url, _europepmc_pdf_url):
+        try:
+            url = resolver(doi)
+        except (requests.RequestException, ValueError):
+            url = None
+        if url:
+            return url
+    return None
+
+
+def _download_pdf(url: str, filepath: str) -> int:
+    """流式下载PDF到文件,返回写入字节数 (非PDF内容返回0)"""
+    with _get_session().get(url, stream=True, timeout=60) as response:
+        if response.status_code != 200:
+            return 0
+        
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= 1024:
+                break
+        if not head.lstrip().startswith(b"%PDF"):
+            return 0  # 落地页而非PDF
+        
+        # 先写入.part临时文件,完整下载后再改名,中途断开不会留下残缺PDF
+        part_path = filepath + ".part"
+        size = 0
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in itertools.chain([head], chunks):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(part_path, filepath)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return size
+
+
+def _fetch_oa_pdf_sync(doi: str, filepath: str) -> int:
+    url = find_oa_pdf_url(doi)
+    if not url:
+        return 0
+    try:
+        return _download_pdf(url, filepath)
+    except (requests.RequestException, OSError):
+        # 磁盘满/权限等写入错误同样回退到浏览器下载,不能中断整批gather
+        return 0
+
+
+async def fetch_oa_pdf(doi: str, filepath: str) -> int:
+    """
+    尝试通过开放获取渠道下载PDF (在工作线程中执行,不阻塞事件循环)
+    
+    Args:
+        doi: DOI
+        filepath: 保存路径
+        
+    Returns:
+        写入的字节数,未找到OA PDF返回0
+    """
+    return await asyncio.to_thread(_fetch_oa_pdf_sync, doi, filepath)
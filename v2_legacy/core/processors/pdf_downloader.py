@@ -3,16 +3,57 @@
 
 功能:
 1. PMID → DOI 转换
-2. 安全下载PDF (使用Playwright模拟浏览器)
-3. 批量下载管理 (带速率限制)
+2. 安全下载PDF (优先开放获取直链,否则使用Playwright模拟浏览器)
+3. 批量下载管理 (共享浏览器 + 并发池 + 按站点自适应限速)
 """
 
 import os
-import time
+import heapq
 import asyncio
-from typing import List, Dict, Any, Tuple
+from urllib.parse import urljoin, urlparse
+from typing import List, Dict, Any, Tuple, Optional
+import aiofiles
 from Bio import Entrez
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, Browser, TimeoutError as PlaywrightTimeoutError
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+from core.cache import doi_cache
+from core.net.rate_limit import HostRateLimiter
+from core.processors.oa_resolver import fetch_oa_pdf
+
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# 同时进行的下载数
+MAX_CONCURRENCY = 3
+
+# 无开放获取版本时使用的PDF源网站
+DEFAULT_SOURCE_URL = "https://sci-net.xyz"
+
+# 页面中出现PDF容器即可继续 (替代固定等待)
+PDF_ELEMENT_PREDICATE_JS = """() => !!(
+    document.querySelector('embed[type="application/pdf"]') || document.querySelector('iframe')
+)"""
+
+# 查找页面中嵌入的PDF地址
+FIND_PDF_SRC_JS = """() => {
+    const embed = document.querySelector('embed[type="application/pdf"]');
+    if (embed) return embed.src;
+    const iframe = document.querySelector('iframe');
+    if (iframe) return iframe.src;
+    return null;
+}"""
+
+
+def _pdf_path(output_dir: str, pmid: str, doi: str) -> str:
+    """PDF保存路径: PMID_<pmid>_<doi>.pdf"""
+    safe_doi = doi.replace("/", "_").replace(":", "_")
+    return os.path.join(output_dir, f"PMID_{pmid}_{safe_doi}.pdf")
 
 
 def pmid_to_doi(pmid: str, email: str = "your_email@example.com") -> str:
@@ -26,28 +67,76 @@ def pmid_to_doi(pmid: str, email: str = "your_email@example.com") -> str:
     Returns:
         DOI字符串,如果未找到返回空字符串
     """
+    try:
+        return fetch_dois([pmid], email).get(pmid, "")
+    except Exception as e:
+        print(f"   ⚠️  PMID {pmid} 转换DOI失败: {e}")
+        return ""
+
+
+def _parse_dois_lxml(handle) -> Dict[str, str]:
+    """
+    流式解析PubMed XML,只读取PMID和DOI (不构建完整记录树)
+    
+    Returns:
+        {pmid: doi} 字典
+    """
+    # Entrez可能返回文本句柄,iterparse需要字节流
+    source = getattr(handle, "buffer", handle)
+    
+    mapping = {}
+    for _, elem in etree.iterparse(source, tag="PubmedArticle"):
+        pmid = elem.findtext("MedlineCitation/PMID")
+        # 只看文章自身的ArticleIdList,避免匹配到参考文献中的DOI
+        doi = elem.findtext("PubmedData/ArticleIdList/ArticleId[@IdType='doi']")
+        if pmid and doi:
+            mapping[pmid.strip()] = doi.strip()
+        # 释放已处理的文章,内存不随结果数增长
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    
+    return mapping
+
+
+def fetch_dois(pmids: List[str], email: str = "your_email@example.com") -> Dict[str, str]:
+    """
+    一次Entrez请求批量查询多个PMID的DOI
+    
+    Args:
+        pmids: PubMed ID列表
+        email: Entrez API所需的email
+        
+    Returns:
+        {pmid: doi} 字典,未找到DOI的PMID不包含在内
+    """
+    if not pmids:
+        return {}
+    
     Entrez.email = email
     
+    handle = Entrez.efetch(db="pubmed", id=",".join(pmids), retmode="xml")
     try:
-        handle = Entrez.efetch(db="pubmed", id=pmid, retmode="xml")
+        if LXML_AVAILABLE:
+            return _parse_dois_lxml(handle)
         record = Entrez.read(handle)
+    finally:
         handle.close()
-        
-        # 从ArticleIdList中查找DOI
-        article_ids = (
-            record['PubmedArticle'][0]
-            .get('PubmedData', {})
-            .get('ArticleIdList', [])
+    
+    # Entrez.read回退路径: ArticleId都是带attributes的StringElement,无需hasattr
+    mapping = {}
+    for article in record.get('PubmedArticle', []):
+        pubmed_data = article.get('PubmedData')
+        if not pubmed_data:
+            continue
+        doi = next(
+            (aid for aid in pubmed_data.get('ArticleIdList', ()) if aid.attributes.get('IdType') == 'doi'),
+            None
         )
-        
-        for aid in article_ids:
-            if hasattr(aid, 'attributes') and aid.attributes.get('IdType') == 'doi':
-                return str(aid)
-        
-        return ""
-    except Exception as e:
-        print(f"   ⚠️  PMID {pmid} 转换DOI失败: {e}")
-        return ""
+        if doi is not None:
+            mapping[str(article['MedlineCitation']['PMID'])] = str(doi)
+    
+    return mapping
 
 
 def convert_pmids_to_dois(
@@ -55,7 +144,7 @@ def convert_pmids_to_dois(
     email: str = "your_email@example.com"
 ) -> List[Dict[str, Any]]:
     """
-    批量转换PMID为DOI
+    批量转换PMID为DOI (SQLite缓存 + 单次批量Entrez请求)
     
     Args:
         papers: 文献列表,每个包含'id'(PMID)字段
@@ -67,36 +156,56 @@ def convert_pmids_to_dois(
     print("\n🔄 [Step 9] PMID → DOI 转换中...")
     print("-" * 80)
     
+    # 已带DOI (如SmartMiner结果) 的无需查询
+    to_resolve = [p['id'] for p in papers if not p.get('doi')]
+    cache = doi_cache.get_many(to_resolve)
+    missing = [pmid for pmid in to_resolve if pmid not in cache]
+    
+    if to_resolve:
+        print(f"   📦 DOI缓存命中: {len(cache)}/{len(to_resolve)}")
+    
+    if missing:
+        try:
+            fetched = fetch_dois(missing, email)
+        except Exception as e:
+            print(f"   ⚠️  批量转换DOI失败: {e}")
+            fetched = {}
+        
+        doi_cache.put_many(fetched)
+        cache.update(fetched)
+    
     for p in papers:
         pmid = p['id']
-        doi = pmid_to_doi(pmid, email)
+        doi = p.get('doi') or cache.get(pmid, "")
         p['doi'] = doi
         
         if doi:
             print(f"   ✅ PMID {pmid} → DOI: {doi}")
         else:
             print(f"   ❌ PMID {pmid} 未找到DOI")
-        
-        time.sleep(0.5)  # 礼貌延迟,避免API限流
     
     print("-" * 80)
     return papers
 
 
-async def download_pdf_safe(
+async def _download_with_browser(
+    browser: Browser,
     doi: str, 
     pmid: str, 
     output_dir: str = "downloaded_pdfs",
-    source_url: str = "https://sci-net.xyz"
+    source_url: str = DEFAULT_SOURCE_URL,
+    rate_limiter: Optional[HostRateLimiter] = None
 ) -> str:
     """
-    安全下载单篇PDF
+    通过浏览器下载单篇PDF
     
     Args:
+        browser: 共享的Playwright浏览器 (每篇使用独立context,cookie不互通)
         doi: DOI
         pmid: PMID (用于命名)
         output_dir: 输出目录
         source_url: PDF源网站
+        rate_limiter: 按站点自适应限速器 (遇429/503自动降速)
         
     Returns:
         下载的PDF文件路径,失败返回空字符串
@@ -105,98 +214,232 @@ async def download_pdf_safe(
     
     url = f"{source_url}/{doi}"
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
+    filepath = _pdf_path(output_dir, pmid, doi)
+    filename = os.path.basename(filepath)
+    
+    # 只记录已写入的字节数,PDF内容写盘后即释放
+    saved_bytes = 0
+    # 响应回调与DOM回退可能同时拿到PDF,加锁保证只写一次文件
+    save_lock = asyncio.Lock()
+    
+    async def save_pdf(response):
+        """读取响应并异步写盘 (不阻塞事件循环);已保存过则跳过"""
+        nonlocal saved_bytes
+        async with save_lock:
+            if saved_bytes:
+                return
+            pdf_data = await response.body()
+            async with aiofiles.open(filepath, "wb") as f:
+                await f.write(pdf_data)
+            saved_bytes = len(pdf_data)
+        print(f"      ✅ PDF捕获成功! 大小: {saved_bytes//1024} KB")
+    
+    # 响应回调在后台执行,用事件等待其写盘完成
+    pdf_seen = False
+    pdf_done = asyncio.Event()
+    
+    context = await browser.new_context(user_agent=USER_AGENT)
+    try:
         page = await context.new_page()
         
-        pdf_data = None
-        
         async def handle_response(response):
-            nonlocal pdf_data
+            nonlocal pdf_seen
             content_type = response.headers.get("content-type", "").lower()
-            if "application/pdf" in content_type:
+            if "application/pdf" in content_type and not pdf_seen:
+                pdf_seen = True
                 try:
-                    pdf_data = await response.body()
-                    print(f"      ✅ PDF捕获成功! 大小: {len(pdf_data)//1024} KB")
+                    await save_pdf(response)
                 except Exception as e:
                     print(f"      ❌ PDF读取失败: {e}")
+                finally:
+                    pdf_done.set()
         
         page.on("response", handle_response)
         
         try:
-            print(f"      🌐 正在访问: {url}")
-            await page.goto(url, wait_until="networkidle", timeout=30000)
-            await asyncio.sleep(2)  # 等待PDF加载
+            host = urlparse(url).netloc
+            if rate_limiter:
+                await rate_limiter.acquire(host)
+            print(f"      🌐 [PMID {pmid}] 正在访问: {url}")
+            nav_response = await page.goto(url, wait_until="networkidle", timeout=30000)
+            if rate_limiter and nav_response:
+                rate_limiter.record(host, nav_response.status)
+            
+            # 等到PDF容器出现即继续,最多5秒
+            if not pdf_seen:
+                try:
+                    await page.wait_for_function(PDF_ELEMENT_PREDICATE_JS, timeout=5000)
+                except PlaywrightTimeoutError:
+                    pass
+            
+            if pdf_seen:
+                await asyncio.wait_for(pdf_done.wait(), timeout=30)
             
             # 检查DOM中的PDF链接
-            if not pdf_data:
-                embed_src = await page.evaluate("""() => {
-                    const embed = document.querySelector('embed[type="application/pdf"]');
-                    if (embed) return embed.src;
-                    const iframe = document.querySelector('iframe');
-                    if (iframe) return iframe.src;
-                    return null;
-                }""")
+            if not saved_bytes:
+                embed_src = await page.evaluate(FIND_PDF_SRC_JS)
                 
                 if embed_src:
                     if embed_src.startswith("//"):
                         embed_src = "https:" + embed_src
                     elif embed_src.startswith("/"):
-                        from urllib.parse import urljoin
                         embed_src = urljoin(url, embed_src)
                     
+                    embed_host = urlparse(embed_src).netloc
+                    if rate_limiter:
+                        await rate_limiter.acquire(embed_host)
                     response = await page.request.get(embed_src)
+                    if rate_limiter:
+                        rate_limiter.record(embed_host, response.status)
+                    # 请求期间响应回调可能已捕获PDF: 先等它写完,save_pdf会跳过重复写入
+                    if pdf_seen:
+                        await asyncio.wait_for(pdf_done.wait(), timeout=30)
                     if response.status == 200:
-                        pdf_data = await response.body()
-                        print(f"      ✅ PDF捕获成功! 大小: {len(pdf_data)//1024} KB")
+                        await save_pdf(response)
         
         except Exception as e:
-            print(f"      ❌ 下载失败: {e}")
-        
-        finally:
-            await browser.close()
+            print(f"      ❌ [PMID {pmid}] 下载失败: {e}")
+    
+    finally:
+        await context.close()
+    
+    if saved_bytes:
+        print(f"      💾 已保存: {filename}")
+        return filepath
+    else:
+        print(f"      ⚠️  下载失败,请手动下载: {url}")
+        return ""
+
+
+class PDFDownloadSession:
+    """
+    可复用的PDF下载会话
+    
+    优先尝试开放获取直链;需要浏览器时才启动Chromium,并在会话内复用。
+    
+    用法:
+        async with PDFDownloadSession() as session:
+            for p in papers:
+                await session.download(p['doi'], p['id'])
+    """
+    
+    def __init__(
+        self,
+        source_url: str = DEFAULT_SOURCE_URL,
+        rate_limiter: Optional[HostRateLimiter] = None
+    ):
+        """
+        Args:
+            source_url: 无OA版本时使用的PDF源网站
+            rate_limiter: 按站点自适应限速器 (默认新建一个)
+        """
+        self.source_url = source_url
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self._playwright = None
+        self._browser: Optional[Browser] = None
+        self._browser_lock = asyncio.Lock()
+    
+    async def __aenter__(self) -> "PDFDownloadSession":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def _get_browser(self) -> Browser:
+        """按需启动浏览器 (并发调用只启动一次)"""
+        async with self._browser_lock:
+            if self._browser is None:
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+            return self._browser
+    
+    async def close(self):
+        """关闭浏览器"""
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+    
+    async def download(self, doi: str, pmid: str, output_dir: str = "downloaded_pdfs") -> str:
+        """
+        下载单篇PDF
         
-        if pdf_data:
-            # 保存PDF
-            safe_doi = doi.replace("/", "_").replace(":", "_")
-            filename = f"PMID_{pmid}_{safe_doi}.pdf"
-            filepath = os.path.join(output_dir, filename)
+        Args:
+            doi: DOI
+            pmid: PMID (用于命名)
+            output_dir: 输出目录
             
-            with open(filepath, "wb") as f:
-                f.write(pdf_data)
-            
-            print(f"      💾 已保存: {filename}")
+        Returns:
+            下载的PDF文件路径,失败返回空字符串
+        """
+        # 开放获取直链: 无需浏览器
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = _pdf_path(output_dir, pmid, doi)
+        size = await fetch_oa_pdf(doi, filepath)
+        if size:
+            print(f"      📖 [PMID {pmid}] 开放获取PDF下载成功! 大小: {size//1024} KB")
             return filepath
-        else:
-            print(f"      ⚠️  下载失败,请手动下载: {url}")
-            return ""
+        
+        return await _download_with_browser(
+            await self._get_browser(), doi, pmid, output_dir,
+            source_url=self.source_url, rate_limiter=self.rate_limiter
+        )
+
+
+async def download_pdf_safe(
+    doi: str, 
+    pmid: str, 
+    output_dir: str = "downloaded_pdfs",
+    source_url: str = DEFAULT_SOURCE_URL,
+    session: Optional[PDFDownloadSession] = None
+) -> str:
+    """
+    安全下载单篇PDF
+    
+    Args:
+        doi: DOI
+        pmid: PMID (用于命名)
+        output_dir: 输出目录
+        source_url: PDF源网站 (传入session时以session为准)
+        session: 可复用的下载会话;不传则临时创建一个
+        
+    Returns:
+        下载的PDF文件路径,失败返回空字符串
+    """
+    if session is not None:
+        return await session.download(doi, pmid, output_dir)
+    
+    async with PDFDownloadSession(source_url=source_url) as single_use:
+        return await single_use.download(doi, pmid, output_dir)
 
 
 async def batch_download_pdfs(
     papers: List[Dict[str, Any]], 
-    delay_seconds: int = 60,
-    output_dir: str = "downloaded_pdfs"
+    requests_per_second: float = 2.0,
+    output_dir: str = "downloaded_pdfs",
+    max_concurrency: int = MAX_CONCURRENCY
 ) -> List[str]:
     """
-    批量下载PDF (带延迟,安全策略)
+    批量下载PDF (优先开放获取直链;其余共享一个按需启动的浏览器,并发下载,按站点自适应限速)
     
     Args:
         papers: 文献列表,每个包含'doi'和'id'(PMID)字段
-        delay_seconds: 每篇下载间隔秒数
+        requests_per_second: 每个站点的初始/最大请求速率 (遇429/503自动减半,成功后逐步恢复)
         output_dir: 输出目录
+        max_concurrency: 最大并发下载数
         
     Returns:
-        成功下载的PDF文件路径列表
+        成功下载的PDF文件路径列表 (保持输入顺序)
     """
-    print(f"\n📥 [Step 10] 开始下载PDF (每篇间隔{delay_seconds}秒)...")
+    print(f"\n📥 [Step 10] 开始下载PDF (并发{max_concurrency}, 每站点≤{requests_per_second}次/秒)...")
     print("-" * 80)
     
-    downloaded_files = []
+    rate_limiter = HostRateLimiter(rate=requests_per_second, burst=max_concurrency)
+    sem = asyncio.Semaphore(max_concurrency)
     
-    for i, p in enumerate(papers):
+    async def download_one(i: int, p: Dict[str, Any], session: PDFDownloadSession) -> str:
         doi = p.get('doi', '')
         pmid = p['id']
         title = p.get('title', 'Unknown')[:60]
@@ -204,20 +447,20 @@ async def batch_download_pdfs(
         if not doi:
             print(f"\n   [{i+1}/{len(papers)}] PMID {pmid} 无DOI,跳过")
             print(f"      标题: {title}...")
-            continue
-        
-        print(f"\n   [{i+1}/{len(papers)}] 下载 PMID {pmid}")
-        print(f"      标题: {title}...")
-        print(f"      DOI: {doi}")
-        
-        filepath = await download_pdf_safe(doi, pmid, output_dir)
-        if filepath:
-            downloaded_files.append(filepath)
+            return ""
         
-        # 安全延迟 (除了最后一篇)
-        if i < len(papers) - 1:
-            print(f"      ⏳ 等待{delay_seconds}秒后继续...")
-            await asyncio.sleep(delay_seconds)
+        async with sem:
+            print(f"\n   [{i+1}/{len(papers)}] 下载 PMID {pmid}")
+            print(f"      标题: {title}...")
+            print(f"      DOI: {doi}")
+            return await session.download(doi, pmid, output_dir)
+    
+    async with PDFDownloadSession(rate_limiter=rate_limiter) as session:
+        results = await asyncio.gather(
+            *(download_one(i, p, session) for i, p in enumerate(papers))
+        )
+    
+    downloaded_files = [f for f in results if f]
     
     print("-" * 80)
     print(f"\n✅ 下载完成! 成功: {len(downloaded_files)}/{len(papers)}")
@@ -228,7 +471,7 @@ def download_top_papers(
     papers: List[Dict[str, Any]], 
     top_n: int = 5,
     email: str = "your_email@example.com",
-    delay_seconds: int = 60,
+    requests_per_second: float = 2.0,
     output_dir: str = "downloaded_pdfs"
 ) -> List[str]:
     """
@@ -238,14 +481,14 @@ def download_top_papers(
         papers: 文献列表
         top_n: 下载前N篇
         email: Entrez API所需的email
-        delay_seconds: 每篇下载间隔秒数
+        requests_per_second: 每个站点的初始/最大请求速率
         output_dir: 输出目录
         
     Returns:
         成功下载的PDF文件路径列表
     """
     # 提取评分最高的N篇
-    top_papers = sorted(papers, key=lambda x: x.get('score', 0), reverse=True)[:top_n]
+    top_papers = heapq.nlargest(top_n, papers, key=lambda x: x.get('score', 0))
     
     print(f"\n📥 [Step 8] 准备下载评分最高的 {top_n} 篇文献PDF...")
     print("-" * 80)
@@ -259,7 +502,7 @@ def download_top_papers(
     
     # Step 10: 批量下载
     downloaded_files = asyncio.run(
-        batch_download_pdfs(top_papers_with_doi, delay_seconds, output_dir)
+        batch_download_pdfs(top_papers_with_doi, requests_per_second, output_dir)
     )
     
     return downloaded_files
@@ -279,8 +522,7 @@ if __name__ == "__main__":
     downloaded = download_top_papers(
         test_papers, 
         top_n=1, 
-        email="test@example.com",
-        delay_seconds=5  # 测试时使用较短延迟
+        email="test@example.com"
     )
     
     print(f"\n✅ 测试完成! 下载文件: {downloaded}")
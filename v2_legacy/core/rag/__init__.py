@@ -0,0 +1,8 @@
+"""
+Core RAG Package
+Retrieved-evidence containers shared by memory and writers
+"""
+
+from .evidence import Evidence
+
+__all__ = ['Evidence']
@@ -0,0 +1,53 @@
+"""
+Evidence - column view of RAG query results
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Abstract characters kept per paper for prompt context
+DOC_CHAR_LIMIT = 800
+
+
+@dataclass(slots=True)
+class Evidence:
+    """
+    Retrieved papers as parallel columns (one entry per paper, same order).
+    Abstracts are truncated once at load time.
+    """
+    ids: List[str]
+    titles: List[str]
+    journals: List[str]
+    years: List[str]
+    docs: List[str]
+    citations: List[Optional[int]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_chroma(cls, results: Dict[str, Any], doc_chars: int = DOC_CHAR_LIMIT) -> "Evidence":
+        """
+        Build from a single-query ChromaDB result.
+
+        Args:
+            results: collection.query() output (ids/metadatas/documents are lists of lists)
+            doc_chars: Abstract characters to keep per paper
+        """
+        if not results or not results.get("ids") or not results["ids"][0]:
+            return cls([], [], [], [], [], [])
+
+        ids = results["ids"][0]
+        metas = (results.get("metadatas") or [[]])[0] or []
+        docs = (results.get("documents") or [[]])[0] or []
+        metas = [m or {} for m in metas] + [{}] * (len(ids) - len(metas))
+        docs = [d or "" for d in docs] + [""] * (len(ids) - len(docs))
+
+        return cls(
+            ids=list(ids),
+            titles=[m.get("title", "") for m in metas],
+            journals=[m.get("journal", "") for m in metas],
+            years=[m.get("year", "") for m in metas],
+            docs=[d[:doc_chars] for d in docs],
+            citations=[m.get("citations") for m in metas],
+        )
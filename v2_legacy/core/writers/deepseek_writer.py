@@ -3,12 +3,15 @@ DeepSeek Writer - AI-powered Literature Review Generator
 Uses DeepSeek API to generate comprehensive reviews from RAG-retrieved papers
 """
 
-import requests
-from typing import Dict, Any, Optional
+from typing import Optional
 
 from config import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, GEMINI_API_KEY, PROMPTS
 from core.llm.llm_client import LLMClient
+from core.rag import Evidence
 
+# Resolved once at import; PROMPTS is static for the process lifetime
+FULL_REVIEW_TEMPLATE = PROMPTS.get("review_writer", {}).get("full_review", "")
+TOPIC_SUMMARY_TEMPLATE = PROMPTS.get("review_writer", {}).get("topic_summary", "")
 
 
 class DeepSeekWriter:
@@ -34,7 +37,7 @@ class DeepSeekWriter:
     def generate_review(
         self,
         topic: str,
-        evidence: Dict[str, Any],
+        evidence: Evidence,
         raw_query: str = "",
         search_term: str = ""
     ) -> str:
@@ -43,7 +46,7 @@ class DeepSeekWriter:
         
         Args:
             topic: Review topic/title
-            evidence: RAG query results with ids, metadatas, documents
+            evidence: Retrieved papers (see PersistentMemory.query_evidence)
             raw_query: Original user query (for context)
             search_term: Expanded search term used
             
@@ -72,21 +75,20 @@ class DeepSeekWriter:
         except Exception as e:
             return f"❌ Review generation failed: {e}"
     
-    def _build_context(self, evidence: Dict[str, Any]) -> str:
+    def _build_context(self, evidence: Evidence) -> str:
         """Build context string from evidence"""
-        context = ""
+        if not evidence:
+            return ""
         
-        if not evidence or not evidence.get("ids") or len(evidence["ids"][0]) == 0:
-            return context
+        parts = []
+        rows = zip(evidence.ids, evidence.titles, evidence.journals, evidence.years, evidence.docs)
+        for i, (pmid, title, journal, year, doc) in enumerate(rows, start=1):
+            parts.append(f"【文献{i}】(PMID:{pmid})\n")
+            parts.append(f"标题: {title}\n")
+            parts.append(f"来源: {journal} ({year})\n")
+            parts.append(f"摘要: {doc}\n\n")
         
-        for i in range(len(evidence["ids"][0])):
-            meta = evidence["metadatas"][0][i]
-            context += f"【文献{i + 1}】(PMID:{evidence['ids'][0][i]})\n"
-            context += f"标题: {meta.get('title', '')}\n"
-            context += f"来源: {meta.get('journal', '')} ({meta.get('year', '')})\n"
-            context += f"摘要: {evidence['documents'][0][i][:800]}\n\n"
-        
-        return context
+        return "".join(parts)
     
     def _build_prompt(
         self,
@@ -94,16 +96,13 @@ class DeepSeekWriter:
         context: str,
         raw_query: str,
         search_term: str,
-        evidence: Dict[str, Any]
+        evidence: Evidence
     ) -> str:
         """Build prompt for DeepSeek"""
-        num_docs = len(evidence["ids"][0])
+        num_docs = len(evidence)
         display_topic = topic or raw_query or "牙周/口腔医学相关主题"
         
-        template = PROMPTS.get("review_writer", {}).get("full_review", "")
-        # Fallback omitted as configuration is reliable
-        
-        prompt = template.format(
+        prompt = FULL_REVIEW_TEMPLATE.format(
             raw_query=raw_query if raw_query else "（未提供）",
             search_term=search_term if search_term else "（未记录）",
             topic=display_topic,
@@ -114,7 +113,7 @@ class DeepSeekWriter:
 
 
 def generate_topic_from_evidence(
-    evidence: Dict[str, Any],
+    evidence: Evidence,
     api_key: str,
     base_url: str,
     gemini_key: Optional[str] = None
@@ -124,21 +123,20 @@ def generate_topic_from_evidence(
     Auto-generate review topic from evidence.
     
     Args:
-        evidence: RAG query results
+        evidence: Retrieved papers
         api_key: DeepSeek API key
         base_url: API base URL
         
     Returns:
         Generated topic string
     """
-    if not evidence or not evidence.get("metadatas"):
+    if not evidence:
         return "Literature Review"
     
     # Extract titles from top papers
-    titles = [m.get('title', '') for m in evidence['metadatas'][0][:5]]
+    titles = evidence.titles[:5]
     
-    template = PROMPTS.get("review_writer", {}).get("topic_summary", "")
-    summary_prompt = template.format(titles="\n".join(titles))
+    summary_prompt = TOPIC_SUMMARY_TEMPLATE.format(titles="\n".join(titles))
     
     
     try:
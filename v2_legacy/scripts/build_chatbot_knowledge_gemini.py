@@ -5,6 +5,11 @@ Run this script to process PDFs and create vector database using Gemini API
 
 import sys
 import os
+import re
+import asyncio
+import bisect
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Add project root to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -13,8 +18,54 @@ from core.chatbot.gemini_embeddings import GeminiEmbeddings
 import chromadb
 from chromadb.config import Settings
 from pathlib import Path
-from streamlit_app.utils.local_pdf_processor import extract_text_to_markdown
-from config import VECTOR_DB_DIR, PDF_DIR
+from streamlit_app.utils.local_pdf_processor import extract_text_to_markdown, MARKDOWN_FORMAT_VERSION
+from config import VECTOR_DB_DIR, PDF_DIR, DATA_DIR
+
+# Chunks buffered across PDFs before embedding + one collection.add
+FLUSH_SIZE = 500
+# Concurrent Gemini batch requests per flush
+EMBED_CONCURRENCY = 5
+# PDF parsing workers (leave one core for the embedding loop)
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Extracted markdown keyed by PDF content hash; reused until the file changes
+MARKDOWN_CACHE_DIR = DATA_DIR / "cache" / "markdown"
+
+def extract_markdown_cached(pdf_path: str) -> str:
+    """extract_text_to_markdown with an on-disk cache keyed by the file's SHA-1 and the markdown format version"""
+    h = hashlib.sha1()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    
+    cached = MARKDOWN_CACHE_DIR / f"{digest}.v{MARKDOWN_FORMAT_VERSION}.md"
+    if cached.exists():
+        return cached.read_text(encoding="utf-8")
+    
+    markdown = extract_text_to_markdown(pdf_path)
+    MARKDOWN_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cached.write_text(markdown, encoding="utf-8")
+    return markdown
+
+def flush_chunks(collection, embeddings, chunks: list) -> int:
+    """Embed buffered chunks concurrently and add them in one insert"""
+    if not chunks:
+        return 0
+    
+    print(f"\n  Getting embeddings for {len(chunks)} buffered chunks...")
+    texts = [c["text"] for c in chunks]
+    chunk_embeddings = asyncio.run(
+        embeddings.embed_documents_async(texts, concurrency=EMBED_CONCURRENCY)
+    )
+    
+    collection.add(
+        documents=texts,
+        embeddings=chunk_embeddings,
+        metadatas=[c["metadata"] for c in chunks],
+        ids=[c["id"] for c in chunks]
+    )
+    print(f"  ✓ Added {len(chunks)} chunks")
+    return len(chunks)
 
 def build_knowledge_base():
     print("=" * 60)
@@ -45,59 +96,74 @@ def build_knowledge_base():
     pdf_files = list(pdf_dir.glob("*.pdf"))
     print(f"Found {len(pdf_files)} PDF files")
     
+    # Fetch already-indexed PDF ids once instead of a metadata filter per PDF
+    existing = collection.get(include=["metadatas"])
+    known_ids = {m["pdf_id"] for m in existing["metadatas"] if m and "pdf_id" in m}
+    
+    to_process = []
+    for pdf_file in pdf_files:
+        if pdf_file.stem in known_ids:
+            print(f"  ⏭️  Skipping (already exists): {pdf_file.name[:50]}")
+        else:
+            to_process.append(pdf_file)
+    
     total_chunks = 0
+    pending = []
     
-    for i, pdf_file in enumerate(pdf_files, 1):
-        print(f"\n[{i}/{len(pdf_files)}] Processing: {pdf_file.name[:50]}...")
+    # Parse PDFs in worker processes; embedding of earlier PDFs overlaps with parsing of later ones
+    with ProcessPoolExecutor(max_workers=EXTRACT_WORKERS) as pool:
+        futures = {
+            pool.submit(extract_markdown_cached, str(pdf_file)): pdf_file
+            for pdf_file in to_process
+        }
         
-        try:
-            # Check if already exists
-            pdf_id = pdf_file.stem
-            existing = collection.get(where={"pdf_id": pdf_id})
-            if existing and existing['ids']:
-                print(f"  ⏭️  Skipping (already exists)")
-                continue
-
-            # Extract text
-            markdown = extract_text_to_markdown(str(pdf_file))
-            
-            # Extract metadata from filename
-            filename = pdf_file.stem
-            parts = filename.split(" - ")
-            metadata = {
-                "filename": pdf_file.name,
-                "pdf_id": pdf_id,
-                "journal": parts[0] if len(parts) > 0 else "Unknown",
-                "year": parts[1] if len(parts) > 1 else "Unknown",
-                "authors": parts[2] if len(parts) > 2 else "Unknown",
-                "title": parts[3] if len(parts) > 3 else filename
-            }
-            
-            # Create chunks
-            chunks = create_chunks(markdown, metadata)
+        for i, future in enumerate(as_completed(futures), 1):
+            pdf_file = futures[future]
+            print(f"\n[{i}/{len(to_process)}] Processing: {pdf_file.name[:50]}...")
             
-            if not chunks:
-                print(f"  ⚠️  No chunks created")
+            try:
+                # Extract text
+                markdown = future.result()
+                
+                # Extract metadata from filename
+                pdf_id = pdf_file.stem
+                filename = pdf_file.stem
+                parts = filename.split(" - ")
+                metadata = {
+                    "filename": pdf_file.name,
+                    "pdf_id": pdf_id,
+                    "journal": parts[0] if len(parts) > 0 else "Unknown",
+                    "year": parts[1] if len(parts) > 1 else "Unknown",
+                    "authors": parts[2] if len(parts) > 2 else "Unknown",
+                    "title": parts[3] if len(parts) > 3 else filename
+                }
+                
+                # Create chunks
+                chunks = create_chunks(markdown, metadata)
+                
+                if not chunks:
+                    print(f"  ⚠️  No chunks created")
+                    continue
+                
+                # Buffer chunks; embed across PDFs in large batches
+                pending.extend(chunks)
+                print(f"  Queued {len(chunks)} chunks")
+                
+            except Exception as e:
+                print(f"  ✗ Failed: {e}")
                 continue
             
-            # Get embeddings from Gemini
-            print(f"  Getting embeddings for {len(chunks)} chunks...")
-            texts = [c["text"] for c in chunks]
-            chunk_embeddings = embeddings.embed_documents(texts)
-            
-            # Add to ChromaDB
-            collection.add(
-                documents=texts,
-                embeddings=chunk_embeddings,
-                metadatas=[c["metadata"] for c in chunks],
-                ids=[c["id"] for c in chunks]
-            )
-            
-            total_chunks += len(chunks)
-            print(f"  ✓ Added {len(chunks)} chunks")
-            
-        except Exception as e:
-            print(f"  ✗ Failed: {e}")
+            if len(pending) >= FLUSH_SIZE:
+                try:
+                    total_chunks += flush_chunks(collection, embeddings, pending)
+                except Exception as e:
+                    print(f"  ✗ Embedding batch failed: {e}")
+                pending = []
+    
+    try:
+        total_chunks += flush_chunks(collection, embeddings, pending)
+    except Exception as e:
+        print(f"  ✗ Embedding batch failed: {e}")
     
     print("\n" + "=" * 60)
     print("✅ Knowledge Base Built Successfully!")
@@ -106,21 +172,32 @@ def build_knowledge_base():
     print(f"Embedding model: Gemini text-embedding-004")
     print("\n✨ You can now use the Chatbot page!")
 
+def _last_stop(stops: list, lo: int, hi: int) -> int:
+    """Offset from lo of the rightmost stop in [lo, hi), or -1"""
+    idx = bisect.bisect_left(stops, hi)
+    if idx and stops[idx - 1] >= lo:
+        return stops[idx - 1] - lo
+    return -1
+
 def create_chunks(text: str, base_metadata: dict, chunk_size: int = 500, overlap: int = 50):
     """Split text into overlapping chunks"""
     chunks = []
     start = 0
     chunk_id = 0
     
+    # Sentence boundaries found in one pass; looked up per chunk with bisect
+    cjk_stops = [m.start() for m in re.finditer("。", text)]
+    dot_stops = [m.start() for m in re.finditer(r"\.", text)]
+    
     while start < len(text):
         end = start + chunk_size
         chunk_text = text[start:end]
         
         # Try to break at sentence boundary
         if end < len(text):
-            last_period = chunk_text.rfind('。')
+            last_period = _last_stop(cjk_stops, start, end)
             if last_period == -1:
-                last_period = chunk_text.rfind('.')
+                last_period = _last_stop(dot_stops, start, end)
             if last_period > chunk_size * 0.5:
                 end = start + last_period + 1
                 chunk_text = text[start:end]
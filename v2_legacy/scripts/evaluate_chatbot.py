@@ -3,7 +3,8 @@ import os
 import sys
 import json
 import time
-from typing import List, Dict
+import asyncio
+from typing import Any, Callable, List, Dict
 
 # Add project root to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -11,9 +12,181 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from core.chatbot.rag_engine import RAGEngine
 from core.chatbot.answer_generator import AnswerGenerator
 from core.llm.llm_client import LLMClient
-from config import GEMINI_API_KEY, DEEPSEEK_API_KEY
+from core.cache import llm_cache
+from config import GEMINI_API_KEY, DEEPSEEK_API_KEY, DATA_DIR
 
-def evaluate():
+SCORE_KEYS = ("retrieval_score", "fidelity_score", "quality_score")
+JUDGE_ERROR_SCORES = {"retrieval_score": 0, "fidelity_score": 0, "quality_score": 0, "reasoning": "Judge Error"}
+NO_RETRIEVAL_SCORES = {"retrieval_score": 0, "fidelity_score": 0, "quality_score": 0, "reasoning": "No retrieval"}
+TOP_K = 5
+# One JSON line per finished question; delete the file to start a fresh evaluation
+RESULTS_PATH = DATA_DIR / "eval" / "chatbot_eval_results.jsonl"
+
+# Everything static lives in the system message so every judge request shares one
+# byte-identical prefix (eligible for provider-side prefix caching); only the tasks vary
+JUDGE_SYSTEM_PROMPT = """You are an expert Periodontist and AI evaluator grading RAG interactions. You output strictly JSON.
+
+Evaluate each interaction on 3 metrics (1-5 score):
+1. Retrieval Relevance: Is the retrieved context relevant to the question?
+2. Answer Fidelity: Is the answer supported by the retrieved context? (No hallucinations)
+3. Answer Quality: Is the answer accurate, comprehensive, and helpful?
+
+Grade each interaction with an object in this format:
+{
+    "retrieval_score": <int>,
+    "fidelity_score": <int>,
+    "quality_score": <int>,
+    "reasoning": "<short explanation>"
+}"""
+
+async def run_pipeline(item: Dict, rag: RAGEngine, generator: AnswerGenerator) -> Dict:
+    """Retrieve and generate for one question (sync clients run in worker threads)"""
+    q = item['q']
+    
+    start_time = time.perf_counter()
+    
+    # A. Retrieval
+    retrieved = await asyncio.to_thread(rag.retrieve, q, top_k=TOP_K)
+    retrieve_time = time.perf_counter() - start_time
+    
+    # Nothing to answer from: skip generation (and later the judge) instead of paying for empty context
+    if not retrieved:
+        return {
+            "item": item,
+            "retrieved": [],
+            "answer": "",
+            "sources": [],
+            "times": {"retrieval": retrieve_time, "generation": 0.0}
+        }
+    if len(retrieved) < TOP_K:
+        # Fewer hits than requested usually means a stale or partially built collection
+        print(f"  ⚠️ Q{item['id']}: retrieved {len(retrieved)}/{TOP_K} chunks")
+    
+    # B. Generation (cached on question + retrieved chunk ids)
+    gen_start = time.perf_counter()
+    gen_key = llm_cache.make_key(f"generate:{generator.model}", [q, sorted(r['id'] for r in retrieved)])
+    ans_res = llm_cache.get(gen_key)
+    if ans_res is None:
+        ans_res = await asyncio.to_thread(generator.generate, q, retrieved)
+        # Failed generations come back without sources; don't pin those
+        if ans_res['sources']:
+            llm_cache.put(gen_key, ans_res)
+    gen_time = time.perf_counter() - gen_start
+    
+    return {
+        "item": item,
+        "retrieved": retrieved,
+        "answer": ans_res['answer'],
+        "sources": ans_res['sources'],
+        "times": {"retrieval": retrieve_time, "generation": gen_time}
+    }
+
+def context_snippet(retrieved: List[Dict], limit: int = 1000) -> str:
+    """First `limit` chars of the newline-joined contents, without joining everything first"""
+    parts = []
+    size = 0
+    for r in retrieved:
+        if size >= limit:
+            break
+        if parts:
+            size += 1  # "\n" separator
+        take = r['content'][:limit - size]
+        parts.append(take)
+        size += len(take)
+    return "\n".join(parts)
+
+def build_task_block(run: Dict) -> str:
+    """Judge input for one RAG interaction"""
+    item = run['item']
+    retrieved_titles = [r['metadata'].get('title', 'Unknown') for r in run['retrieved']]
+    return f"""
+    QUESTION: {item['q']}
+    
+    EXPECTED CONCEPTS: {', '.join(item['concepts'])}
+    
+    RETRIEVED CONTEXT TITLES: {retrieved_titles}
+    RETRIEVED CONTENT SNIPPET: {context_snippet(run['retrieved'])}...
+    
+    AI ANSWER: {run['answer']}
+    """
+
+def is_valid_scores(scores) -> bool:
+    return isinstance(scores, dict) and all(isinstance(scores.get(k), int) for k in SCORE_KEYS)
+
+def is_valid_batch(batch, n: int) -> bool:
+    return isinstance(batch, list) and len(batch) == n and all(is_valid_scores(s) for s in batch)
+
+def call_judge(judge: LLMClient, prompt: str, is_valid: Callable[[Any], bool]):
+    """
+    Send one judge prompt and decode its JSON reply (cached by prompt hash).
+    Only replies accepted by is_valid are cached, so a malformed answer is re-asked next run.
+    """
+    messages = [
+        {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    provider = "gemini" if judge.gemini_key else "deepseek"
+    key = llm_cache.make_key(f"judge:{provider}", messages)
+    cached = llm_cache.get(key)
+    if cached is not None and is_valid(cached):
+        return cached
+    
+    judge_res = judge.chat_completion(messages)
+    # Clean generic markdown code blocks if present
+    judge_res = judge_res.replace("```json", "").replace("```", "").strip()
+    parsed = json.loads(judge_res)
+    if is_valid(parsed):
+        llm_cache.put(key, parsed)
+    return parsed
+
+def judge_one(judge: LLMClient, run: Dict) -> Dict:
+    """Grade a single interaction (fallback path)"""
+    prompt = f"""
+    Grade the following RAG interaction. Output a single JSON object.
+    {build_task_block(run)}
+    """
+    try:
+        scores = call_judge(judge, prompt, is_valid_scores)
+        if not is_valid_scores(scores):
+            raise ValueError(f"Unexpected judge output: {scores}")
+        return scores
+    except Exception as e:
+        return {**JUDGE_ERROR_SCORES, "error": str(e)}
+
+def judge_batch(judge: LLMClient, runs: List[Dict]) -> List[Dict]:
+    """Grade all interactions in one judge request; re-ask individually only for bad entries"""
+    tasks = "\n".join(f"    ### Task {i}\n{build_task_block(run)}" for i, run in enumerate(runs, 1))
+    prompt = f"""
+    Grade the following {len(runs)} RAG interactions. Output a JSON array of {len(runs)} objects, one per task in order.
+    {tasks}
+    """
+    try:
+        batch = call_judge(judge, prompt, lambda b: is_valid_batch(b, len(runs)))
+    except Exception as e:
+        print(f"  ⚠️ Batched judge failed ({e}), grading individually...")
+        batch = []
+    if not isinstance(batch, list):
+        batch = []
+    
+    results = []
+    for i, run in enumerate(runs):
+        scores = batch[i] if i < len(batch) else None
+        results.append(scores if is_valid_scores(scores) else judge_one(judge, run))
+    return results
+
+def load_checkpoint() -> Dict[int, Dict]:
+    """Results already written by an earlier (possibly interrupted) run, keyed by question id"""
+    if not RESULTS_PATH.exists():
+        return {}
+    done = {}
+    with open(RESULTS_PATH, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                done[entry['id']] = entry
+    return done
+
+async def evaluate():
     print("="*60)
     print("🤖 Chatbot Evaluation System (LLM-as-a-Judge)")
     print("="*60)
@@ -69,87 +242,49 @@ def evaluate():
         }
     ]
 
-    results = []
-    
-    print(f"\n[Test] Running pipeline on {len(questions)} questions...\n")
+    # Resume: reuse finished questions from the checkpoint file
+    done = load_checkpoint()
+    results = [done[item['id']] for item in questions if item['id'] in done]
+    questions = [item for item in questions if item['id'] not in done]
+    if done:
+        print(f"\n[Resume] {len(results)} questions already evaluated in {RESULTS_PATH.name}")
 
-    for item in questions:
-        q = item['q']
-        print(f"🔹 Q{item['id']}: {q}")
-        
-        start_time = time.time()
-        
-        # A. Retrieval
-        retrieved = rag.retrieve(q, top_k=5)
-        retrieve_time = time.time() - start_time
-        
-        # Check retrieval content
-        retrieved_text = "\n".join([r['content'] for r in retrieved])
-        retrieved_titles = [r['metadata'].get('title', 'Unknown') for r in retrieved]
-        
-        # B. Generation
-        gen_start = time.time()
-        ans_res = generator.generate(q, retrieved)
-        answer = ans_res['answer']
-        sources = ans_res['sources']
-        gen_time = time.time() - gen_start
-        
-        # C. Evaluation (The Judge)
-        eval_prompt = f"""
-        You are an expert Periodontist and AI evaluator. Grade the following RAG interaction.
-        
-        QUESTION: {q}
-        
-        EXPECTED CONCEPTS: {', '.join(item['concepts'])}
-        
-        RETRIEVED CONTEXT TITLES: {retrieved_titles}
-        RETRIEVED CONTENT SNIPPET: {retrieved_text[:1000]}...
-        
-        AI ANSWER: {answer}
-        
-        Evaluate on 3 metrics (1-5 score):
-        1. Retrieval Relevance: Is the retrieved context relevant to the question?
-        2. Answer Fidelity: Is the answer supported by the retrieved context? (No hallucinations)
-        3. Answer Quality: Is the answer accurate, comprehensive, and helpful?
-        
-        Output strictly in JSON format:
-        {{
-            "retrieval_score": <int>,
-            "fidelity_score": <int>,
-            "quality_score": <int>,
-            "reasoning": "<short explanation>"
-        }}
-        """
-        
-        try:
-            # System prompt for JSON
-            judge_res = judge.chat_completion([
-                {"role": "system", "content": "You are a helpful assistant that outputs strictly JSON."},
-                {"role": "user", "content": eval_prompt}
-            ])
-            # Clean generic markdown code blocks if present
-            judge_res = judge_res.replace("```json", "").replace("```", "").strip()
-            scores = json.loads(judge_res)
-        except Exception as e:
-            print(f"  ⚠️ Judge failed: {e}")
-            scores = {"retrieval_score": 0, "fidelity_score": 0, "quality_score": 0, "reasoning": "Judge Error"}
-
-        # Store result
-        res_entry = {
-            "id": item['id'],
-            "q": q,
-            "retrieval_count": len(retrieved),
-            "cit_count": len(sources),
-            "scores": scores,
-            "times": {"retrieval": retrieve_time, "generation": gen_time}
-        }
-        results.append(res_entry)
+    print(f"\n[Test] Running pipeline on {len(questions)} questions concurrently...\n")
+    
+    # A+B for all questions in flight at once; total time ~ the slowest question
+    runs = await asyncio.gather(*[run_pipeline(item, rag, generator) for item in questions])
+    
+    # C. Evaluation (The Judge): one request grades every interaction that had context
+    to_judge = [run for run in runs if run['retrieved']]
+    judged = iter(await asyncio.to_thread(judge_batch, judge, to_judge) if to_judge else [])
+    all_scores = [next(judged) if run['retrieved'] else dict(NO_RETRIEVAL_SCORES) for run in runs]
+    
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(RESULTS_PATH, "a", encoding="utf-8") as checkpoint:
+        for run, scores in zip(runs, all_scores):
+            res_entry = {
+                "id": run['item']['id'],
+                "q": run['item']['q'],
+                "retrieval_count": len(run['retrieved']),
+                "cit_count": len(run['sources']),
+                "scores": scores,
+                "times": run['times']
+            }
+            results.append(res_entry)
+            # Empty retrievals and judge failures are not checkpointed so a rerun tries them again
+            if run['retrieved'] and not scores.get('error'):
+                checkpoint.write(json.dumps(res_entry, ensure_ascii=False) + "\n")
+                checkpoint.flush()
         
-        # Print Summary
-        print(f"  ✅ R({len(retrieved)}) | C({len(sources)}) | Time: {retrieve_time+gen_time:.2f}s")
-        print(f"  🏆 Scores: R={scores['retrieval_score']} F={scores['fidelity_score']} Q={scores['quality_score']}")
-        print(f"  📝 Judge: {scores.get('reasoning', 'No reasoning')[:100]}...")
-        print("-" * 40)
+            print(f"🔹 Q{res_entry['id']}: {res_entry['q']}")
+            if not run['retrieved']:
+                print("  ⚠️ No chunks retrieved; generation and judging skipped")
+            elif scores.get('error'):
+                print(f"  ⚠️ Judge failed: {scores['error']}")
+            print(f"  ✅ R({res_entry['retrieval_count']}) | C({res_entry['cit_count']}) | Time: {res_entry['times']['retrieval'] + res_entry['times']['generation']:.2f}s")
+            print(f"  🏆 Scores: R={scores['retrieval_score']} F={scores['fidelity_score']} Q={scores['quality_score']}")
+            print(f"  📝 Judge: {scores.get('reasoning', 'No reasoning')[:100]}...")
+            print("-" * 40)
 
     # 3. Final Report
     print("\n" + "="*60)
@@ -182,4 +317,4 @@ def evaluate():
     print("="*60)
 
 if __name__ == "__main__":
-    evaluate()
+    asyncio.run(evaluate())
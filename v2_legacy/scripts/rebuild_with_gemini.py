@@ -5,13 +5,42 @@ Reuses existing text chunks, only regenerates embeddings
 
 import sys
 import os
+import asyncio
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.chatbot.gemini_embeddings import GeminiEmbeddings
 import chromadb
 from chromadb.config import Settings
+from tqdm import tqdm
 from config import VECTOR_DB_DIR
 
+# Rows per collection.add; large inserts amortize Chroma's per-call HNSW/sqlite overhead
+ADD_BATCH_SIZE = 5000
+# Concurrent Gemini batch requests; raise only if the key's per-minute quota allows
+EMBED_CONCURRENCY = 5
+
+async def embed_and_add(collection, embeddings_client, documents, metadatas, ids, add_size, on_batch_done=None):
+    """
+    Embed and insert slice by slice: slice k is added in a worker thread
+    while slice k+1 is being embedded, so at most two slices are held in memory
+    """
+    pending_add = None
+    for i in range(0, len(documents), add_size):
+        vectors = await embeddings_client.embed_documents_async(
+            documents[i:i+add_size], concurrency=EMBED_CONCURRENCY, on_batch_done=on_batch_done
+        )
+        if pending_add:
+            await pending_add
+        pending_add = asyncio.create_task(asyncio.to_thread(
+            collection.add,
+            documents=documents[i:i+add_size],
+            embeddings=vectors,
+            metadatas=metadatas[i:i+add_size],
+            ids=ids[i:i+add_size]
+        ))
+    if pending_add:
+        await pending_add
+
 def rebuild_with_gemini():
     print("=" * 60)
     print("Rebuilding with Gemini Embeddings (Fast)")
@@ -58,29 +87,12 @@ def rebuild_with_gemini():
     print(f"\n[4/4] Generating Gemini embeddings for {len(documents)} chunks...")
     print("This will take a few minutes...")
     
-    batch_size = 100
-    total_batches = (len(documents) + batch_size - 1) // batch_size
-    
-    for i in range(0, len(documents), batch_size):
-        batch_docs = documents[i:i+batch_size]
-        batch_metas = metadatas[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
-        
-        batch_num = i // batch_size + 1
-        print(f"  Batch {batch_num}/{total_batches}: Processing {len(batch_docs)} chunks...")
-        
-        # Get embeddings from Gemini
-        batch_embeddings = embeddings_client.embed_documents(batch_docs)
-        
-        # Add to collection
-        new_collection.add(
-            documents=batch_docs,
-            embeddings=batch_embeddings,
-            metadatas=batch_metas,
-            ids=batch_ids
-        )
-        
-        print(f"    ✓ Added {len(batch_docs)} chunks")
+    # Gemini requests stay at the API batch limit but run concurrently (results keep input order);
+    # the collection is written in a few large adds that overlap with embedding the next slice
+    add_size = min(ADD_BATCH_SIZE, old_client.get_max_batch_size())
+    with tqdm(total=len(documents), desc="Embedding", unit="chunk") as bar:
+        asyncio.run(embed_and_add(new_collection, embeddings_client, documents, metadatas, ids, add_size, bar.update))
+    print(f"✅ Added {len(documents)} chunks")
     
     print("\n" + "=" * 60)
     print("✅ Knowledge Base Rebuilt Successfully!")
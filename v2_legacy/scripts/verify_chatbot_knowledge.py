@@ -1,7 +1,9 @@
 
 import sys
 import os
+import argparse
 import chromadb
+from collections import Counter
 from pathlib import Path
 
 # Add project root to path
@@ -9,7 +11,10 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from config import VECTOR_DB_DIR
 
-def verify_knowledge_base():
+# Metadata rows fetched per collection.get call
+PAGE_SIZE = 10000
+
+def verify_knowledge_base(verbose: bool = False):
     print("=" * 60)
     print("Verifying Chatbot Knowledge Base")
     print("=" * 60)
@@ -28,25 +33,28 @@ def verify_knowledge_base():
         print(f"❌ Collection 'periodontal_core' not found: {e}")
         return
 
-    # Get all documents
-    result = collection.get()
-    ids = result["ids"]
-    metadatas = result["metadatas"]
-    
-    print(f"Total chunks in DB: {len(ids)}")
+    # Map chunks to files; page through metadata only so memory stays flat for large collections
+    chunk_counts = Counter()
+    filenames = {}
+    total_chunks = 0
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas"], limit=PAGE_SIZE, offset=offset)
+        metadatas = batch["metadatas"]
+        if not metadatas:
+            break
+        chunk_counts.update(meta.get("pdf_id") for meta in metadatas)
+        for meta in metadatas:
+            filenames.setdefault(meta.get("pdf_id"), meta.get("filename"))
+        total_chunks += len(metadatas)
+        offset += PAGE_SIZE
     
-    # Map chunks to files
-    file_chunks = {}
-    for meta in metadatas:
-        pdf_id = meta.get("pdf_id")
-        filename = meta.get("filename")
-        if pdf_id not in file_chunks:
-            file_chunks[pdf_id] = {"count": 0, "filename": filename}
-        file_chunks[pdf_id]["count"] += 1
+    print(f"Total chunks in DB: {total_chunks}")
         
-    print("\n--- Processed Files in DB ---")
-    for pdf_id, info in file_chunks.items():
-        print(f"📄 {info['filename'][:50]}... : {info['count']} chunks")
+    if verbose:
+        print("\n--- Processed Files in DB ---")
+        for pdf_id, count in chunk_counts.items():
+            print(f"📄 {filenames[pdf_id][:50]}... : {count} chunks")
 
     # Check against source directory
     pdf_dir = Path("v2_legacy/data/pdfs/chatbot_knowledge")
@@ -58,29 +66,32 @@ def verify_knowledge_base():
         print(f"\n❌ Source directory not found: {pdf_dir}")
         return
 
-    source_files = list(pdf_dir.glob("*.pdf"))
-    print(f"\nFound {len(source_files)} source PDF files")
+    source_ids = {p.stem: p for p in pdf_dir.glob("*.pdf")}
+    print(f"\nFound {len(source_ids)} source PDF files")
     
-    missing_files = []
-    empty_files = []
+    # Classify with set ops instead of a per-file print loop
+    indexed = source_ids.keys() & chunk_counts.keys()
+    missing = source_ids.keys() - chunk_counts.keys()
+    empty = {pdf_id for pdf_id in indexed if chunk_counts[pdf_id] == 0}
+    present = indexed - empty
     
     print("\n--- Validation Results ---")
-    for pdf_file in source_files:
-        pdf_id = pdf_file.stem
-        if pdf_id not in file_chunks:
-            print(f"❌ MISSING: {pdf_file.name}")
-            missing_files.append(pdf_file.name)
-        elif file_chunks[pdf_id]["count"] == 0:
-            print(f"⚠️  EMPTY (0 chunks): {pdf_file.name}")
-            empty_files.append(pdf_file.name)
-        else:
-             print(f"✅ OK: {pdf_file.name} ({file_chunks[pdf_id]['count']} chunks)")
+    for pdf_id in sorted(missing):
+        print(f"❌ MISSING: {source_ids[pdf_id].name}")
+    for pdf_id in sorted(empty):
+        print(f"⚠️  EMPTY (0 chunks): {source_ids[pdf_id].name}")
+    if verbose:
+        for pdf_id in sorted(present):
+            print(f"✅ OK: {source_ids[pdf_id].name} ({chunk_counts[pdf_id]} chunks)")
 
     print("-" * 60)
-    print(f"Summary: {len(source_files)} source files")
-    print(f"Missing in DB: {len(missing_files)}")
-    print(f"Empty in DB: {len(empty_files)}")
-    print(f"Present in DB: {len(file_chunks)}")
+    print(f"Summary: {len(source_ids)} source files")
+    print(f"Missing in DB: {len(missing)}")
+    print(f"Empty in DB: {len(empty)}")
+    print(f"Present in DB: {len(present)}")
 
 if __name__ == "__main__":
-    verify_knowledge_base()
+    parser = argparse.ArgumentParser(description="Verify chatbot knowledge base against source PDFs")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List every indexed file, not just problems")
+    args = parser.parse_args()
+    verify_knowledge_base(verbose=args.verbose)
@@ -107,29 +107,30 @@ metric_col1, metric_col2, metric_col3 = st.columns(3)
 with metric_col1:
     st.metric("Stored Queries", num_queries)
 
+@st.cache_data(ttl=30)
+def count_collections(db_dir: str) -> int:
+    """Vector DB folders that contain a chroma.sqlite3 (one scandir pass)"""
+    if not os.path.isdir(db_dir):
+        return 0
+    with os.scandir(db_dir) as it:
+        # Rough estimate - ChromaDB stores metadata in chroma.sqlite3
+        return sum(1 for e in it if e.is_dir() and os.path.exists(os.path.join(e.path, "chroma.sqlite3")))
+
+@st.cache_data(ttl=30)
+def count_pdfs(pdf_dir: str) -> int:
+    """PDF files in a directory (one scandir pass)"""
+    if not os.path.isdir(pdf_dir):
+        return 0
+    with os.scandir(pdf_dir) as it:
+        return sum(1 for e in it if e.name.endswith('.pdf'))
+
 with metric_col2:
-    # Count total papers (approximate by counting ChromaDB documents)
-    total_papers = 0
-    db_dir = "data/vector_dbs"
-    if os.path.exists(db_dir):
-        for folder in os.listdir(db_dir):
-            folder_path = os.path.join(db_dir, folder)
-            if os.path.isdir(folder_path):
-                # Rough estimate - ChromaDB stores metadata in chroma.sqlite3
-                chroma_db = os.path.join(folder_path, "chroma.sqlite3")
-                if os.path.exists(chroma_db):
-                    total_papers += 1  # Placeholder - could parse actual count
-    
-    st.metric("Database Collections", total_papers)
+    # Count total papers (approximate by counting ChromaDB collections)
+    st.metric("Database Collections", count_collections("data/vector_dbs"))
 
 with metric_col3:
     # Count downloaded PDFs
-    pdf_dir = "data/raw_pdfs"
-    num_pdfs = 0
-    if os.path.exists(pdf_dir):
-        num_pdfs = len([f for f in os.listdir(pdf_dir) if f.endswith('.pdf')])
-    
-    st.metric("Downloaded PDFs", num_pdfs)
+    st.metric("Downloaded PDFs", count_pdfs("data/raw_pdfs"))
 
 # Recent searches
 if queries:
@@ -6,6 +6,8 @@ Upload PDF and extract structured content using AI
 import streamlit as st
 import sys
 import os
+import io
+import zipfile
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
@@ -26,6 +28,62 @@ st.set_page_config(
 )
 
 
+# Each upload has a new pdf_id, so bound the cache instead of keeping every ZIP for the server's lifetime
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def build_images_zip(image_paths: tuple) -> bytes:
+    """ZIP the extracted images once per image set (cached across reruns)"""
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for img_path in image_paths:
+            if os.path.exists(img_path):
+                zip_file.write(img_path, os.path.basename(img_path))
+    return zip_buffer.getvalue()
+
+
+@st.fragment
+def render_image_grid(images: list, pdf_id: str):
+    """ZIP button + 2-column preview; interactions here rerun only this fragment"""
+    if not images:
+        st.info("No images detected")
+        return
+    
+    st.markdown(f"#### 🖼️ Figures & Tables ({len(images)})")
+    
+    # Batch download button
+    st.download_button(
+        "📦 Download All Images (ZIP)",
+        data=build_images_zip(tuple(images)),
+        file_name=f"{pdf_id}_images.zip",
+        mime="application/zip",
+        use_container_width=True
+    )
+    
+    st.divider()
+    
+    # Show mini grid
+    img_cols = st.columns(2)
+    for idx, img_path in enumerate(images):
+        if os.path.exists(img_path):
+            img_cols[idx % 2].image(img_path, caption=f"Img {idx+1}", use_container_width=True)
+
+
+@st.cache_resource
+def get_content_extractor(api_key: str) -> ContentExtractor:
+    """One DeepSeek client per API key (cached)"""
+    return ContentExtractor(api_key=api_key)
+
+
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def analyze_paper(markdown: str, filename: str, _api_key: str) -> dict:
+    """LLM extraction for the PPT, memoized on the text so reruns don't re-bill DeepSeek"""
+    paper_data = get_content_extractor(_api_key).extract_from_text(markdown)
+    # Raising keeps the failure out of the cache, so the next click retries DeepSeek
+    if paper_data.get("background") == "Extraction Failed":
+        raise RuntimeError("DeepSeek content extraction failed, please try again")
+    paper_data["title"] = paper_data.get("title", filename.replace(".pdf", ""))
+    return paper_data
+
+
 # Sidebar Configuration
 with st.sidebar:
     st.header("⚙️ Settings")
@@ -84,9 +142,7 @@ if 'processed_result' in st.session_state:
                 st.warning("⚠️ Please enter your DeepSeek API Key in the sidebar first!")
             else:
                 with st.spinner("🤖 Analyzing & Generating PPT..."):
-                    extractor = ContentExtractor()
-                    paper_data = extractor.extract_from_text(result.markdown)
-                    paper_data["title"] = paper_data.get("title", uploaded_file.name.replace(".pdf", ""))
+                    paper_data = analyze_paper(result.markdown, uploaded_file.name, os.environ["DEEPSEEK_API_KEY"])
                     
                     all_images = result.figures + result.tables
                     ppt_gen = PPTGenerator()
@@ -125,39 +181,8 @@ if 'processed_result' in st.session_state:
     
     with col2:
         # Figures & Tables
-        images = result.figures + result.tables
-        if images:
-             st.markdown(f"#### 🖼️ Figures & Tables ({len(images)})")
-             
-             # Batch download button
-             import zipfile
-             import io
-             
-             zip_buffer = io.BytesIO()
-             with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                 for idx, img_path in enumerate(images):
-                     if os.path.exists(img_path):
-                         zip_file.write(img_path, os.path.basename(img_path))
-             
-             st.download_button(
-                 "📦 Download All Images (ZIP)",
-                 data=zip_buffer.getvalue(),
-                 file_name=f"{result.pdf_id}_images.zip",
-                 mime="application/zip",
-                 use_container_width=True
-             )
-             
-             st.divider()
-             
-             # Show mini grid
-             img_cols = st.columns(2)
-             for idx, img_path in enumerate(images):
-                 if os.path.exists(img_path):
-                     img_cols[idx % 2].image(img_path, caption=f"Img {idx+1}", use_container_width=True)
-        else:
-             st.info("No images detected")
+        render_image_grid(result.figures + result.tables, result.pdf_id)
 
-    
     # --- Add to Knowledge Base Section ---
     st.divider()
     st.markdown("#### 🧠 Knowledge Base Integration")
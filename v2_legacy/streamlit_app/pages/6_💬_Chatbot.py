@@ -136,10 +136,13 @@ if user_input:
     # Generate response
     with st.chat_message("assistant"):
         with st.spinner("🤔 思考中..."):
+            # Same recent turns feed retrieval and generation
+            recent = conv_manager.get_history(last_n=5)
+            
             # Retrieve relevant docs
             retrieved = rag_engine.retrieve(
                 user_input,
-                conversation_history=conv_manager.get_history(last_n=5)
+                conversation_history=recent
             )
             
             if not retrieved:
@@ -150,7 +153,7 @@ if user_input:
                 result = answer_gen.generate(
                     question=user_input,
                     retrieved_docs=retrieved,
-                    conversation_history=conv_manager.get_history(last_n=5)
+                    conversation_history=recent
                 )
                 
                 response = result['answer']
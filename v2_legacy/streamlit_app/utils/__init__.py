@@ -10,7 +10,7 @@ from .backend import (
 from .local_pdf_processor import process_local_pdf
 
 # Tools functionality
-from .pmid_tools import lookup_pmid
+from .pmid_tools import lookup_pmid, lookup_pmids
 
 from .ui_components import (
     display_paper_card,
@@ -26,6 +26,7 @@ __all__ = [
     'get_available_queries',
     'process_local_pdf',
     'lookup_pmid',
+    'lookup_pmids',
     'display_paper_card',
     'log_container',
     'progress_tracker',
@@ -4,8 +4,10 @@ Wrapper functions for backend components (SmartMiner, DeepSeekWriter, etc.)
 """
 
 import os
+import re
 import sys
 import hashlib
+from functools import lru_cache
 from typing import List, Dict, Callable, Optional
 from datetime import datetime
 
@@ -25,6 +27,95 @@ PisminFetcher = None
 convert_pdf_to_markdown = None
 FigureProcessor = None
 
+# Papers per add_papers call: two full Gemini embedding requests, one collection.add each
+STORE_BATCH_SIZE = 200
+
+VECTOR_DBS_DIR = os.path.join(PROJECT_ROOT, "data/vector_dbs")
+# original query -> DB folder slug, so lookups don't walk every folder's metadata
+QUERY_INDEX_PATH = os.path.join(VECTOR_DBS_DIR, "_index.json")
+
+# Review filename sanitization: drop punctuation, then join words with "_"
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w\s-]')
+_FILENAME_SEPARATORS = re.compile(r'[-\s]+')
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked (still atomic) writes
+    fcntl = None
+
+
+def _load_query_index() -> Dict[str, str]:
+    """Read the query -> slug index ({} if missing or unreadable)"""
+    import json
+    
+    try:
+        with open(QUERY_INDEX_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _update_query_index(query: str, slug: str):
+    """Record query -> slug; locked read-modify-write, then atomic replace"""
+    import json
+    
+    os.makedirs(VECTOR_DBS_DIR, exist_ok=True)
+    with open(QUERY_INDEX_PATH + ".lock", "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        index = _load_query_index()
+        if index.get(query) == slug:
+            return
+        index[query] = slug
+        tmp_path = QUERY_INDEX_PATH + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, QUERY_INDEX_PATH)
+
+
+def _find_db_folder(query: str) -> Optional[str]:
+    """
+    Resolve an original query to its DB folder name.
+    
+    Uses the index first; falls back to scanning folder metadata (legacy DBs)
+    and records any hit so the next lookup is a single JSON read.
+    """
+    import json
+    
+    slug = _load_query_index().get(query)
+    if slug and os.path.isdir(os.path.join(VECTOR_DBS_DIR, slug)):
+        return slug
+    
+    try:
+        it = os.scandir(VECTOR_DBS_DIR)
+    except FileNotFoundError:
+        return None
+    
+    target_folder = None
+    with it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            
+            # Check metadata file (open directly; a missing file means a legacy DB)
+            metadata_file = os.path.join(entry.path, "query_metadata.json")
+            try:
+                with open(metadata_file, 'r', encoding='utf-8') as f:
+                    if json.load(f).get("original_query") == query:
+                        target_folder = entry.name
+                        break
+            except FileNotFoundError:
+                # Legacy: check if slug matches
+                if entry.name.replace("_", " ") == query or entry.name == query:
+                    target_folder = entry.name
+                    break
+            except Exception:
+                pass
+    
+    if target_folder:
+        _update_query_index(query, target_folder)
+    return target_folder
+
 
 def run_smart_mining(query: str, limit: int, email: str, gemini_key: Optional[str] = None, log_callback: Optional[Callable] = None) -> List[Dict]:
 
@@ -50,7 +141,6 @@ def run_smart_mining(query: str, limit: int, email: str, gemini_key: Optional[st
     papers = miner.mine(expanded_query, limit)
     
     # Store to ChromaDB
-    import re
     import json
     slug = re.sub(r"[^a-zA-Z0-9]+", "_", query).strip("_")
     
@@ -62,7 +152,7 @@ def run_smart_mining(query: str, limit: int, email: str, gemini_key: Optional[st
         if log_callback:
             log_callback(f"ℹ️ Using hash-based collection name: {slug}")
     
-    db_path = os.path.join(PROJECT_ROOT, "data/vector_dbs", slug)
+    db_path = os.path.join(VECTOR_DBS_DIR, slug)
     
     # Save original query to metadata file
     os.makedirs(db_path, exist_ok=True)
@@ -74,12 +164,17 @@ def run_smart_mining(query: str, limit: int, email: str, gemini_key: Optional[st
     }
     with open(metadata_file, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
+    _update_query_index(query, slug)
     
     if log_callback:
         log_callback(f"💾 Storing {len(papers)} papers to ChromaDB...")
     
     mem = PersistentMemory(db_name=f"db_{slug}", data_dir=db_path)
-    mem.add_papers(papers)
+    for i in range(0, len(papers), STORE_BATCH_SIZE):
+        batch = papers[i:i + STORE_BATCH_SIZE]
+        mem.add_papers(batch)
+        if log_callback and len(papers) > STORE_BATCH_SIZE:
+            log_callback(f"💾 Stored {i + len(batch)}/{len(papers)} papers")
     
     if log_callback:
         log_callback(f"✅ Storage complete!")
@@ -106,35 +201,12 @@ def generate_ai_review(
     Returns:
         Dictionary with review text and metadata
     """
-    import json
-    
     if log_callback:
         log_callback(f"🔍 Looking for database: {query}")
     
     # Find database folder by original query
-    db_dir = os.path.join(PROJECT_ROOT, "data/vector_dbs")
-    target_folder = None
-    
-    for folder in os.listdir(db_dir):
-        folder_path = os.path.join(db_dir, folder)
-        if not os.path.isdir(folder_path):
-            continue
-            
-        # Check metadata file
-        metadata_file = os.path.join(folder_path, "query_metadata.json")
-        if os.path.exists(metadata_file):
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                    if metadata.get("original_query") == query:
-                        target_folder = folder
-                        break
-            except Exception:
-                pass
-        # Legacy: check if slug matches
-        elif folder.replace("_", " ") == query or folder == query:
-            target_folder = folder
-            break
+    db_dir = VECTOR_DBS_DIR
+    target_folder = _find_db_folder(query)
     
     if not target_folder:
         error_msg = f"❌ Database not found for query: {query}"
@@ -151,13 +223,13 @@ def generate_ai_review(
     # Load vector DB and retrieve papers
     mem = PersistentMemory(db_name=f"db_{slug}", data_dir=db_path)
     search_query = topic or query
-    evidence = mem.query(search_query, n=n_results)
+    evidence = mem.query_evidence(search_query, n=n_results)
     
-    if not evidence or not evidence.get("ids") or len(evidence["ids"][0]) == 0:
+    if not evidence:
         raise ValueError("No papers found in vector database")
     
     if log_callback:
-        log_callback(f"📖 Retrieved {len(evidence['ids'][0])} papers from vector DB")
+        log_callback(f"📖 Retrieved {len(evidence)} papers from vector DB")
     
     # Generate or use provided topic
     final_topic = topic
@@ -195,18 +267,13 @@ def generate_ai_review(
         search_term=query
     )
     
-    # Append references section
-    if evidence and evidence.get("ids") and len(evidence["ids"][0]) > 0:
-        references = "\n\n## 参考文献\n\n"
-        ids = evidence["ids"][0]
-        metas = evidence.get("metadatas", [[]])[0]
+    # Append references section (lines collected, joined once)
+    if evidence:
+        references = ["\n\n## 参考文献\n\n"]
+        rows = zip(evidence.ids, evidence.titles, evidence.journals, evidence.years, evidence.citations)
         
-        for idx, pmid in enumerate(ids, start=1):
-            meta = metas[idx - 1] if idx - 1 < len(metas) else {}
-            title = meta.get("title", "No Title")
-            journal = meta.get("journal", "")
-            year = meta.get("year", "")
-            citations = meta.get("citations", None)
+        for idx, (pmid, title, journal, year, citations) in enumerate(rows, start=1):
+            title = title or "No Title"
             
             ref_line = f"{idx}. {title}"
             if journal or year:
@@ -216,16 +283,13 @@ def generate_ai_review(
                 ref_line += f", 被引:{citations}"
             ref_line += ")\n"
             
-            references += ref_line
+            references.append(ref_line)
         
-        markdown += references
+        markdown += "".join(references)
     
     # Save to file with topic as filename
-    import re
-    safe_filename = re.sub(r'[^\w\s-]', '', final_topic).strip()
-    safe_filename = re.sub(r'[-\s]+', '_', safe_filename)
-    if len(safe_filename) > 100:
-        safe_filename = safe_filename[:100]
+    safe_filename = _UNSAFE_FILENAME_CHARS.sub('', final_topic).strip()
+    safe_filename = _FILENAME_SEPARATORS.sub('_', safe_filename)[:100]
     
     output_path = os.path.join(PROJECT_ROOT, f"{safe_filename}.md")
     try:
@@ -294,11 +358,8 @@ def fetch_fulltext(
     
     fetcher = PisminFetcher(download_dir=os.path.join(PROJECT_ROOT, "data/raw_pdfs"))
     
-    # Run async fetch in event loop
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    pdf_path = loop.run_until_complete(fetcher.fetch_pdf(target_doi))
-    loop.close()
+    # asyncio.run closes the loop even if the fetch raises
+    pdf_path = asyncio.run(fetcher.fetch_pdf(target_doi))
     
     if not pdf_path:
         raise ValueError("Could not fetch PDF from Pismin/SciHub.")
@@ -332,6 +393,23 @@ def fetch_fulltext(
     }
 
 
+# Sidebar query list, reused until data/vector_dbs gains or loses a folder
+_QUERIES_CACHE = {"mtime": None, "data": []}
+
+
+@lru_cache(maxsize=512)
+def _read_original_query(metadata_file: str, mtime_ns: int, folder: str) -> str:
+    """Parse one query_metadata.json; mtime_ns in the key invalidates on rewrite"""
+    import json
+    
+    try:
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get("original_query", folder)
+    except Exception:
+        # Fallback: convert slug back to readable format
+        return folder.replace("_", " ")
+
+
 def get_available_queries() -> List[str]:
     """
     Get list of available queries from vector_dbs directory.
@@ -339,28 +417,31 @@ def get_available_queries() -> List[str]:
     Returns:
         List of original query names (not slugs)
     """
-    import json
-    
-    db_dir = os.path.join(PROJECT_ROOT, "data/vector_dbs")
-    if not os.path.exists(db_dir):
+    db_dir = VECTOR_DBS_DIR
+    try:
+        dir_mtime = os.stat(db_dir).st_mtime_ns
+    except FileNotFoundError:
         return []
     
+    if _QUERIES_CACHE["mtime"] == dir_mtime:
+        return list(_QUERIES_CACHE["data"])
+    
     queries = []
-    for folder in os.listdir(db_dir):
-        folder_path = os.path.join(db_dir, folder)
-        if os.path.isdir(folder_path):
+    with os.scandir(db_dir) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
             # Try to read metadata file first
-            metadata_file = os.path.join(folder_path, "query_metadata.json")
-            if os.path.exists(metadata_file):
-                try:
-                    with open(metadata_file, 'r', encoding='utf-8') as f:
-                        metadata = json.load(f)
-                        queries.append(metadata.get("original_query", folder))
-                except Exception:
-                    # Fallback: convert slug back to readable format
-                    queries.append(folder.replace("_", " "))
-            else:
+            metadata_file = os.path.join(entry.path, "query_metadata.json")
+            try:
+                mtime_ns = os.stat(metadata_file).st_mtime_ns
+            except FileNotFoundError:
                 # Legacy: convert slug back to readable format
-                queries.append(folder.replace("_", " "))
-    
-    return sorted(queries, reverse=True)  # Most recent first
+                queries.append(entry.name.replace("_", " "))
+                continue
+            queries.append(_read_original_query(metadata_file, mtime_ns, entry.name))
+    
+    queries.sort(reverse=True)  # Most recent first
+    _QUERIES_CACHE["mtime"] = dir_mtime
+    _QUERIES_CACHE["data"] = queries
+    return list(queries)
@@ -4,12 +4,26 @@ Upload and extract structured content from PDFs using AI
 """
 
 import os
+import shutil
 import fitz  # PyMuPDF
-from typing import Dict, List
+from collections import Counter
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Dict, List, Union
 from datetime import datetime
 from dataclasses import dataclass
 
 
+# Markdown layout revision; bump when extract_text_to_markdown output changes so on-disk caches rebuild
+MARKDOWN_FORMAT_VERSION = 2
+# Text blocks this much larger than the body font are rendered as headings
+HEADING_SIZE_RATIO = 1.3
+# Pages per Detectron2 forward pass (bounded by GPU/CPU memory at 200 dpi)
+LAYOUT_BATCH_SIZE = 4
+# Uploads at or above this size are copied to disk in chunks
+STREAM_COPY_THRESHOLD = 8 * 1024 * 1024
+
+
 @dataclass
 class ProcessedContent:
     """Structured content from PDF"""
@@ -37,81 +51,179 @@ def save_uploaded_pdf(uploaded_file, pdf_id: str) -> str:
     os.makedirs(PDF_DIR, exist_ok=True)
     pdf_path = os.path.join(PDF_DIR, f"{pdf_id}.pdf")
     
-    # Save uploaded file
+    # Save uploaded file: small in-memory uploads in one write (getbuffer is a zero-copy view),
+    # anything else streamed in 1 MB chunks so memory stays flat for plain file objects
     with open(pdf_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+        if hasattr(uploaded_file, "getbuffer") and getattr(uploaded_file, "size", 0) < STREAM_COPY_THRESHOLD:
+            f.write(uploaded_file.getbuffer())
+        else:
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
     
     return pdf_path
 
 
-def extract_text_to_markdown(pdf_path: str) -> str:
+def _is_references_header(text: str) -> bool:
+    """Strict check to avoid false positives in sentences"""
+    lowered = text.lower()
+    is_ref_header = (
+        lowered in ["references", "bibliography", "literature cited"] or
+        lowered.startswith("references\n")
+    )
+    # Only a likely header (short, standalone)
+    return is_ref_header and len(text) < 30
+
+
+def extract_text_to_markdown(pdf: Union[str, "fitz.Document"]) -> str:
     """
     Extract text from PDF and format as Markdown.
     
+    Headings are blocks set noticeably larger than the body font
+    (the most common size by character count).
+    
     Args:
-        pdf_path: Path to PDF file
+        pdf: Path to PDF file, or an already-open document (left open)
         
     Returns:
         Markdown-formatted text
     """
-    doc = fitz.open(pdf_path)
-    markdown_lines = []
-    
-    # Add metadata
-    markdown_lines.append(f"# PDF Document Analysis\n\n")
-    markdown_lines.append(f"**Pages**: {len(doc)}\n\n")
-    markdown_lines.append("---\n\n")
-    
-    references_started = False
+    pages = []          # per page: [(text, max font size)]
+    size_chars = Counter()
+    references_page = None
     
-    for page_num in range(len(doc)):
-        if references_started:
-            break
-            
-        page = doc[page_num]
-        
-        # Add page header
-        markdown_lines.append(f"## Page {page_num + 1}\n\n")
-        
-        # Extract text blocks
-        blocks = page.get_text("blocks")
-        
-        for block in blocks:
-            if len(block) >= 5:
-                text = block[4].strip()
+    # A path is opened here and released promptly, even if a page fails to parse;
+    # a caller-owned document is reused as-is
+    opened = nullcontext(pdf) if isinstance(pdf, fitz.Document) else fitz.open(pdf)
+    with opened as doc:
+        num_pages = doc.page_count
+        for page_num, page in enumerate(doc):
+            blocks = []
+            # TEXTFLAGS_TEXT leaves out image blocks, so no image data is decoded
+            for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+                lines = []
+                block_size = 0.0
+                for line in block.get("lines", []):
+                    spans = line["spans"]
+                    lines.append("".join(span["text"] for span in spans))
+                    for span in spans:
+                        size_chars[round(span["size"], 1)] += len(span["text"])
+                        block_size = max(block_size, span["size"])
                 
+                text = "\n".join(lines).strip()
                 if not text:
                     continue
                 
-                # Check for References section header
-                # Strict check to avoid false positives in sentences
-                is_ref_header = (
-                    text.lower() in ["references", "bibliography", "literature cited"] or
-                    text.lower().startswith("references\n") or
-                    text.lower() == "references" 
-                )
-                
-                # If it's a likely header (short, standalone)
-                if is_ref_header and len(text) < 30:
+                if _is_references_header(text):
                     print(f"[*] Found References section on page {page_num+1}, stopping text extraction.")
-                    markdown_lines.append("\n--- [References Removed] ---\n")
-                    references_started = True
+                    references_page = page_num
                     break
-
-                # Simple heuristic for formatting
-                if len(text) < 100 and text.isupper():
-                    # Likely a heading
-                    markdown_lines.append(f"### {text}\n\n")
-                else:
-                    # Regular paragraph
-                    markdown_lines.append(f"{text}\n\n")
-        
+                blocks.append((text, block_size))
+            
+            pages.append(blocks)
+            if references_page is not None:
+                break
+    
+    body_size = size_chars.most_common(1)[0][0] if size_chars else 0.0
+    heading_size = body_size * HEADING_SIZE_RATIO
+    
+    # Add metadata
+    markdown_lines = [
+        "# PDF Document Analysis\n\n",
+        f"**Pages**: {num_pages}\n\n",
+        "---\n\n",
+    ]
+    for page_num, blocks in enumerate(pages):
+        # Add page header
+        markdown_lines.append(f"## Page {page_num + 1}\n\n")
+        for text, size in blocks:
+            if size >= heading_size and len(text) < 100:
+                # Likely a heading
+                markdown_lines.append(f"### {text}\n\n")
+            else:
+                # Regular paragraph
+                markdown_lines.append(f"{text}\n\n")
+        if page_num == references_page:
+            markdown_lines.append("\n--- [References Removed] ---\n")
         markdown_lines.append("\n")
     
-    doc.close()
     return "".join(markdown_lines)
 
 
+def _render_pdf_pages(doc: "fitz.Document", dpi: int = 200):
+    """
+    Rasterize pages of an open document in-process with PyMuPDF (no subprocess, no temp files).
+
+    Yields:
+        (H, W, 3) uint8 RGB numpy array per page
+    """
+    import numpy as np
+
+    matrix = fitz.Matrix(dpi / 72, dpi / 72)
+    for page in doc:
+        pix = page.get_pixmap(matrix=matrix, alpha=False)
+        yield np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def _batched(iterable, size: int):
+    """Yield lists of up to `size` items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@lru_cache(maxsize=1)
+def _load_layout_model(weights_path: str):
+    """
+    Build the PubLayNet Detectron2 model once per process.
+
+    The module stays imported across Streamlit reruns and CLI loops, so later
+    PDFs reuse the deserialized weights instead of reloading model_final.pth.
+    """
+    import layoutparser as lp
+
+    return lp.Detectron2LayoutModel(
+        config_path='lp://PubLayNet/mask_rcnn_X_101_32x8d_FPN_3x/config',
+        model_path=weights_path,
+        extra_config=["MODEL.ROI_HEADS.SCORE_THRESH_TEST", 0.5],
+        label_map={0: "Text", 1: "Title", 2: "List", 3: "Table", 4: "Figure"}
+    )
+
+
+def _detect_layouts(model, images: List) -> List:
+    """
+    Run LayoutParser's Detectron2 model on several pages in one forward pass.
+
+    Mirrors DefaultPredictor's per-image preprocessing, then calls the
+    underlying network with a list of inputs. Falls back to per-page
+    model.detect() if the predictor internals are not available.
+    """
+    predictor = getattr(model, "model", None)
+    if not hasattr(model, "gather_output") or not all(
+        hasattr(predictor, attr) for attr in ("model", "aug", "input_format")
+    ):
+        return [model.detect(image) for image in images]
+
+    import torch
+
+    inputs = []
+    for image in images:
+        # Same channel handling as DefaultPredictor.__call__
+        original = image[:, :, ::-1] if predictor.input_format == "RGB" else image
+        height, width = original.shape[:2]
+        resized = predictor.aug.get_transform(original).apply_image(original)
+        tensor = torch.as_tensor(resized.astype("float32").transpose(2, 0, 1))
+        inputs.append({"image": tensor, "height": height, "width": width})
+
+    with torch.no_grad():
+        outputs = predictor.model(inputs)
+    return [model.gather_output(output) for output in outputs]
+
+
 def extract_structured_content(pdf_path: str, pdf_id: str) -> ProcessedContent:
     """
     Extract structured content from PDF using AI.
@@ -138,97 +250,77 @@ def extract_structured_content(pdf_path: str, pdf_id: str) -> ProcessedContent:
     for dir_path in [output_base, figures_dir, tables_dir]:
         os.makedirs(dir_path, exist_ok=True)
     
-    # Extract text to markdown
-    print(f"[*] Extracting text from PDF...")
-    markdown = extract_text_to_markdown(pdf_path)
+    # One open document serves text extraction, rasterization and the page count
+    with fitz.open(pdf_path) as doc:
+        # Extract text to markdown
+        print(f"[*] Extracting text from PDF...")
+        markdown = extract_text_to_markdown(doc)
     
-    # Save markdown
-    md_path = os.path.join(output_base, "content.md")
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write(markdown)
+        # Save markdown
+        md_path = os.path.join(output_base, "content.md")
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write(markdown)
     
-    # Extract figures and tables using LayoutParser AI
-    figures = []
-    tables = []
+        # Extract figures and tables using LayoutParser AI
+        figures = []
+        tables = []
     
-    try:
-        import layoutparser as lp
-        import cv2
-        import numpy as np
-        from pdf2image import convert_from_path
+        try:
+            from PIL import Image
         
-        print(f"[*] Initializing AI Layout Model...")
+            print(f"[*] Initializing AI Layout Model...")
         
-        # Load local model
-        home_dir = os.path.expanduser("~")
-        local_weights = os.path.join(home_dir, ".layoutparser", "model_final.pth")
+            # Load local model (cached after the first PDF)
+            home_dir = os.path.expanduser("~")
+            local_weights = os.path.join(home_dir, ".layoutparser", "model_final.pth")
         
-        if os.path.exists(local_weights):
-            model = lp.Detectron2LayoutModel(
-                config_path='lp://PubLayNet/mask_rcnn_X_101_32x8d_FPN_3x/config',
-                model_path=local_weights,
-                extra_config=["MODEL.ROI_HEADS.SCORE_THRESH_TEST", 0.5],
-                label_map={0: "Text", 1: "Title", 2: "List", 3: "Table", 4: "Figure"}
-            )
-            
-            print(f"[*] Converting PDF to images...")
-            images = convert_from_path(pdf_path, dpi=200)
+            if os.path.exists(local_weights):
+                model = _load_layout_model(local_weights)
             
-            for page_num, image in enumerate(images):
-                print(f"    [AI] Analyzing Page {page_num + 1}...")
+                print(f"[*] Rendering PDF pages...")
+                pages = enumerate(_render_pdf_pages(doc, dpi=200))
+                for batch in _batched(pages, LAYOUT_BATCH_SIZE):
+                    print(f"    [AI] Analyzing Pages {batch[0][0] + 1}-{batch[-1][0] + 1}...")
+                    layouts = _detect_layouts(model, [image_np for _, image_np in batch])
                 
-                image_np = np.array(image)
-                layout = model.detect(image_np)
-                
-                # Extract figures
-                figure_blocks = lp.Layout([b for b in layout if b.type == 'Figure'])
-                for fig_idx, block in enumerate(figure_blocks):
-                    try:
-                        segment = block.crop_image(image_np)
-                        
-                        if segment.size == 0 or segment.shape[0] < 50 or segment.shape[1] < 50:
-                            continue
-                        
-                        filename = f"page{page_num+1}_fig{fig_idx+1}.png"
-                        filepath = os.path.join(figures_dir, filename)
-                        
-                        segment_bgr = cv2.cvtColor(segment, cv2.COLOR_RGB2BGR)
-                        cv2.imwrite(filepath, segment_bgr)
-                        figures.append(filepath)
-                        print(f"          -> Saved figure: {filename}")
-                    except Exception as e:
-                        print(f"          [Skip] Figure extraction error: {e}")
-                
-                # Extract tables
-                table_blocks = lp.Layout([b for b in layout if b.type == 'Table'])
-                for tbl_idx, block in enumerate(table_blocks):
-                    try:
-                        segment = block.crop_image(image_np)
-                        
-                        if segment.size == 0 or segment.shape[0] < 50 or segment.shape[1] < 50:
-                            continue
-                        
-                        filename = f"page{page_num+1}_table{tbl_idx+1}.png"
-                        filepath = os.path.join(tables_dir, filename)
-                        
-                        segment_bgr = cv2.cvtColor(segment, cv2.COLOR_RGB2BGR)
-                        cv2.imwrite(filepath, segment_bgr)
-                        tables.append(filepath)
-                        print(f"          -> Saved table: {filename}")
-                    except Exception as e:
-                        print(f"          [Skip] Table extraction error: {e}")
+                    for (page_num, image_np), layout in zip(batch, layouts):
+                        # One pass over the layout collects both block types
+                        blocks_by_type = {"Figure": [], "Table": []}
+                        for block in layout:
+                            if block.type in blocks_by_type:
+                                blocks_by_type[block.type].append(block)
+                    
+                        targets = (
+                            ("Figure", "fig", figures_dir, figures),
+                            ("Table", "table", tables_dir, tables),
+                        )
+                        for block_type, suffix, out_dir, saved in targets:
+                            for idx, block in enumerate(blocks_by_type[block_type]):
+                                try:
+                                    segment = block.crop_image(image_np)
+                                
+                                    height, width = segment.shape[:2]
+                                    if height < 50 or width < 50:
+                                        continue
+                                
+                                    filename = f"page{page_num+1}_{suffix}{idx+1}.png"
+                                    filepath = os.path.join(out_dir, filename)
+                                
+                                    # Pages are RGB already; PIL writes them without a BGR round-trip
+                                    Image.fromarray(segment).save(filepath, compress_level=3)
+                                    saved.append(filepath)
+                                    print(f"          -> Saved {block_type.lower()}: {filename}")
+                                except Exception as e:
+                                    print(f"          [Skip] {block_type} extraction error: {e}")
             
-            print(f"[*] AI extraction complete: {len(figures)} figures, {len(tables)} tables")
-        else:
-            print(f"[!] AI model not found, skipping figure/table extraction")
+                print(f"[*] AI extraction complete: {len(figures)} figures, {len(tables)} tables")
+            else:
+                print(f"[!] AI model not found, skipping figure/table extraction")
             
-    except Exception as e:
-        print(f"[!] AI extraction error: {e}")
+        except Exception as e:
+            print(f"[!] AI extraction error: {e}")
     
-    # Get page count
-    doc = fitz.open(pdf_path)
-    num_pages = len(doc)
-    doc.close()
+        num_pages = doc.page_count
     
     return ProcessedContent(
         pdf_id=pdf_id,
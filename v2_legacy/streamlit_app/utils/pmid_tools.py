@@ -3,14 +3,148 @@ PMID Lookup Tools
 Quick information retrieval from PubMed
 """
 
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, List
 from Bio import Entrez
-from config import PUBMED_EMAIL
+from config import PUBMED_EMAIL, NCBI_API_KEY
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+
+# IDs per efetch call; Biopython switches to POST above 200 IDs, so stay at that size
+EFETCH_BATCH_SIZE = 200
+
+
+def _parse_article(article) -> Dict:
+    """Build the lookup result for one Entrez.read PubmedArticle record (fallback without lxml)"""
+    medline = article['MedlineCitation']
+    pmid = str(medline['PMID'])
+    article_data = medline['Article']
+    
+    # Extract title
+    title = article_data.get('ArticleTitle', 'No title')
+    
+    # Extract abstract
+    abstract_data = article_data.get('Abstract', {}).get('AbstractText', [])
+    if isinstance(abstract_data, list):
+        abstract = ' '.join(str(item) for item in abstract_data)
+    else:
+        abstract = str(abstract_data) if abstract_data else 'No abstract available'
+    
+    # Extract journal and year
+    journal = article_data.get('Journal', {}).get('Title', 'Unknown')
+    pub_date = article_data.get('Journal', {}).get('JournalIssue', {}).get('PubDate', {})
+    year = pub_date.get('Year', 'Unknown')
+    
+    # Extract DOI
+    article_ids = article.get('PubmedData', {}).get('ArticleIdList', [])
+    doi = ""
+    for aid in article_ids:
+        if hasattr(aid, 'attributes') and aid.attributes.get('IdType') == 'doi':
+            doi = str(aid)
+            break
+    
+    return _build_result(pmid, doi, title, abstract, journal, year)
+
+
+def _build_result(pmid: str, doi: str, title: str, abstract: str, journal: str, year: str) -> Dict:
+    """Lookup dict with PubMed / DOI / Sci-Hub links"""
+    return {
+        'pmid': pmid,
+        'doi': doi if doi else "Not available",
+        'title': title,
+        'abstract': abstract,
+        'journal': journal,
+        'year': year,
+        'pubmed_url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+        'doi_url': f"https://doi.org/{doi}" if doi else "",
+        'scihub_url': f"https://sci-hub.se/{doi}" if doi else ""
+    }
+
+
+def _element_text(elem) -> str:
+    """Full text of an element, including inline markup such as <i> or <sup>"""
+    return "".join(elem.itertext()) if elem is not None else ""
+
+
+def _parse_articles_lxml(handle) -> List[Dict]:
+    """
+    Stream PubmedArticle records with lxml, reading only the fields lookup_pmid returns.
+    The handle is parsed incrementally and each finished article is removed from the
+    tree, so memory stays flat for large batches.
+    """
+    # iterparse needs a byte stream; a text-mode handle exposes its underlying buffer
+    source = getattr(handle, "buffer", handle)
+    
+    results = []
+    for _, elem in etree.iterparse(source, tag="PubmedArticle"):
+        pmid = (elem.findtext("MedlineCitation/PMID") or "").strip()
+        article = elem.find("MedlineCitation/Article")
+        if pmid and article is not None:
+            title_elem = article.find("ArticleTitle")
+            title = _element_text(title_elem) if title_elem is not None else 'No title'
+            abstract = ' '.join(_element_text(item) for item in article.iterfind("Abstract/AbstractText"))
+            journal = article.findtext("Journal/Title") or 'Unknown'
+            year = article.findtext("Journal/JournalIssue/PubDate/Year") or 'Unknown'
+            # Only the article's own ArticleIdList, not DOIs from its reference list
+            doi = (elem.findtext("PubmedData/ArticleIdList/ArticleId[@IdType='doi']") or "").strip()
+            
+            results.append(_build_result(pmid, doi, title, abstract, journal, year))
+        
+        # clear() empties the element but leaves it attached to the root; drop earlier siblings too
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    
+    return results
+
+
+def lookup_pmids(pmids: List[str]) -> Dict[str, Dict]:
+    """
+    Look up several PMIDs with one efetch request per EFETCH_BATCH_SIZE IDs.
+    
+    Args:
+        pmids: PubMed IDs
+        
+    Returns:
+        {pmid: lookup dict} (see lookup_pmid); PMIDs PubMed did not return are omitted
+    """
+    Entrez.email = PUBMED_EMAIL
+    # With a key Biopython's built-in throttle allows 10 req/s instead of 3
+    Entrez.api_key = NCBI_API_KEY
+    
+    pmids = list(dict.fromkeys(str(p).strip() for p in pmids if str(p).strip()))
+    results = {}
+    for i in range(0, len(pmids), EFETCH_BATCH_SIZE):
+        batch = pmids[i:i + EFETCH_BATCH_SIZE]
+        handle = Entrez.efetch(db="pubmed", id=",".join(batch), retmode="xml")
+        try:
+            if LXML_AVAILABLE:
+                parsed = _parse_articles_lxml(handle)
+            else:
+                records = Entrez.read(handle)
+                parsed = [_parse_article(article) for article in records.get('PubmedArticle', [])]
+        finally:
+            handle.close()
+        
+        for info in parsed:
+            results[info['pmid']] = info
+    return results
+
+
+@lru_cache(maxsize=4096)
+def _lookup_pmid_cached(pmid: str) -> Dict:
+    return lookup_pmids([pmid])[pmid]
 
 
 def lookup_pmid(pmid: str) -> Dict:
     """
     Look up PMID and return DOI, title, and links.
+    Repeat lookups in the same process are served from memory.
     
     Args:
         pmid: PubMed ID
@@ -18,60 +152,9 @@ def lookup_pmid(pmid: str) -> Dict:
     Returns:
         Dict with doi, title, abstract, journal, year, and URLs
     """
-    Entrez.email = PUBMED_EMAIL
-    
     try:
-        # Fetch from PubMed
-        handle = Entrez.efetch(db="pubmed", id=pmid, retmode="xml")
-        records = Entrez.read(handle)
-        handle.close()
-        
-        if not records or 'PubmedArticle' not in records:
-            raise ValueError(f"No results found for PMID {pmid}")
-        
-        article = records['PubmedArticle'][0]
-        medline = article['MedlineCitation']
-        article_data = medline['Article']
-        
-        # Extract title
-        title = article_data.get('ArticleTitle', 'No title')
-        
-        # Extract abstract
-        abstract_data = article_data.get('Abstract', {}).get('AbstractText', [])
-        if isinstance(abstract_data, list):
-            abstract = ' '.join(str(item) for item in abstract_data)
-        else:
-            abstract = str(abstract_data) if abstract_data else 'No abstract available'
-        
-        # Extract journal and year
-        journal = article_data.get('Journal', {}).get('Title', 'Unknown')
-        pub_date = article_data.get('Journal', {}).get('JournalIssue', {}).get('PubDate', {})
-        year = pub_date.get('Year', 'Unknown')
-        
-        # Extract DOI
-        article_ids = article.get('PubmedData', {}).get('ArticleIdList', [])
-        doi = ""
-        for aid in article_ids:
-            if hasattr(aid, 'attributes') and aid.attributes.get('IdType') == 'doi':
-                doi = str(aid)
-                break
-        
-        # Generate URLs
-        pubmed_url = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/"
-        doi_url = f"https://doi.org/{doi}" if doi else ""
-        scihub_url = f"https://sci-hub.se/{doi}" if doi else ""
-        
-        return {
-            'pmid': pmid,
-            'doi': doi if doi else "Not available",
-            'title': title,
-            'abstract': abstract,
-            'journal': journal,
-            'year': year,
-            'pubmed_url': pubmed_url,
-            'doi_url': doi_url,
-            'scihub_url': scihub_url
-        }
-        
+        return dict(_lookup_pmid_cached(str(pmid).strip()))
+    except KeyError:
+        raise Exception(f"Failed to lookup PMID {pmid}: No results found for PMID {pmid}")
     except Exception as e:
         raise Exception(f"Failed to lookup PMID {pmid}: {str(e)}")